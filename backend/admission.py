@@ -0,0 +1,177 @@
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import HTTPException, Request
+from fastapi.routing import APIRoute
+from auth import get_current_user, security
+from database import run_db
+from jobs import queue_backlog
+
+# Configuration (0 disables a limit)
+UPLOAD_MAX_IN_FLIGHT = int(os.getenv("UPLOAD_MAX_IN_FLIGHT", "16"))
+UPLOAD_RATE_PER_USER = float(os.getenv("UPLOAD_RATE_PER_USER", "0.5"))  # uploads per second
+UPLOAD_BURST_PER_USER = int(os.getenv("UPLOAD_BURST_PER_USER", "20"))
+UPLOAD_MAX_QUEUE_DEPTH = int(os.getenv("UPLOAD_MAX_QUEUE_DEPTH", "1000"))
+UPLOAD_QUEUE_DEPTH_TTL = float(os.getenv("UPLOAD_QUEUE_DEPTH_TTL", "1"))  # seconds between queue checks
+UPLOAD_MAX_RETRY_AFTER = int(os.getenv("UPLOAD_MAX_RETRY_AFTER", "300"))
+UPLOAD_RATE_MAX_USERS = int(os.getenv("UPLOAD_RATE_MAX_USERS", "10000"))
+
+
+class TokenBucket:
+    """Per-user token buckets; a bucket refills at ``rate`` tokens per second up to ``burst``"""
+
+    def __init__(self, rate: float, burst: int, max_users: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        # user id -> (tokens, monotonic time of the last refill), least recently used first
+        self._buckets = OrderedDict()
+
+    def _refill(self, user_id) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        self._buckets[user_id] = (tokens, now)
+        if len(self._buckets) > self.max_users:
+            # Forgetting a user only hands them a full bucket again
+            self._buckets.popitem(last=False)
+        return tokens
+
+    def take(self, user_id, count: float = 1) -> float:
+        """Take ``count`` tokens; returns 0, or the seconds until they are available"""
+        tokens = self._refill(user_id)
+        if tokens < count:
+            return (count - tokens) / self.rate
+        self._buckets[user_id] = (tokens - count, self._buckets[user_id][1])
+        return 0.0
+
+    def charge(self, user_id, count: float) -> None:
+        """Take tokens even if that leaves the bucket in debt (for work only known after admission)"""
+        tokens = self._refill(user_id)
+        self._buckets[user_id] = (tokens - count, self._buckets[user_id][1])
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+def _too_many_requests(detail: str, retry_after: float) -> HTTPException:
+    retry_after = min(max(math.ceil(retry_after), 1), UPLOAD_MAX_RETRY_AFTER)
+    return HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(retry_after)})
+
+
+class UploadAdmission:
+    """
+    Admission control for uploads, checked before the request body is read
+
+    An upload is rejected with 429 and ``Retry-After`` when ``max_in_flight``
+    uploads are already being handled, when the analysis queue holds
+    ``max_queue_depth`` jobs (the wait is estimated from how fast it has been
+    draining), or when the user's token bucket is empty. Admitted uploads
+    therefore never queue behind an unbounded backlog.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = UPLOAD_MAX_IN_FLIGHT,
+        rate: float = UPLOAD_RATE_PER_USER,
+        burst: int = UPLOAD_BURST_PER_USER,
+        max_queue_depth: int = UPLOAD_MAX_QUEUE_DEPTH,
+        queue_depth_ttl: float = UPLOAD_QUEUE_DEPTH_TTL,
+        max_users: int = UPLOAD_RATE_MAX_USERS,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue_depth = max_queue_depth
+        self.queue_depth_ttl = queue_depth_ttl
+        self.buckets = TokenBucket(rate, burst, max_users) if rate > 0 else None
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.drain_rate = 0.0
+        self._queue_checked = 0.0
+        self.admitted = 0
+        self.rejected = {"in_flight": 0, "queue_depth": 0, "user_quota": 0}
+
+    async def _check_queue(self) -> None:
+        if not self.max_queue_depth:
+            return
+        now = time.monotonic()
+        if now - self._queue_checked >= self.queue_depth_ttl:
+            # Claim the refresh first so concurrent uploads keep using the last value
+            self._queue_checked = now
+            self.queue_depth, self.drain_rate = await run_db(queue_backlog)
+        if self.queue_depth >= self.max_queue_depth:
+            self.rejected["queue_depth"] += 1
+            excess = self.queue_depth - self.max_queue_depth + 1
+            retry_after = excess / self.drain_rate if self.drain_rate > 0 else UPLOAD_MAX_RETRY_AFTER
+            raise _too_many_requests(
+                f"Analysis queue is full ({self.queue_depth} jobs). Please retry later.", retry_after
+            )
+
+    def _take_token(self, user_id) -> None:
+        if self.buckets is None:
+            return
+        wait = self.buckets.take(user_id)
+        if wait:
+            self.rejected["user_quota"] += 1
+            raise _too_many_requests(
+                f"Upload rate limit exceeded ({self.buckets.rate:g}/s, burst {self.buckets.burst})", wait
+            )
+
+    @asynccontextmanager
+    async def admit(self, user_id):
+        """Hold one upload slot for the duration of the block, or raise 429"""
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            self.rejected["in_flight"] += 1
+            raise _too_many_requests("Too many uploads in progress. Please retry shortly.", 1)
+        self.in_flight += 1
+        try:
+            await self._check_queue()
+            self._take_token(user_id)
+            self.admitted += 1
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def charge(self, user_id, count: int) -> None:
+        """Bill extra uploads found after admission, e.g. the rest of a batch"""
+        if self.buckets is not None and count > 0:
+            self.buckets.charge(user_id, count)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "queue_drain_rate": round(self.drain_rate, 3),
+            "user_rate": self.buckets.rate if self.buckets else 0,
+            "user_burst": self.buckets.burst if self.buckets else 0,
+            "users_tracked": len(self.buckets) if self.buckets else 0,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+upload_admission = UploadAdmission()
+
+
+class AdmissionControlledRoute(APIRoute):
+    """
+    Route that goes through ``upload_admission`` before FastAPI reads the body
+
+    Dependencies run only after the whole multipart body has been received,
+    so the user is authenticated here as well (a principal cache hit) to
+    turn away uploads without buffering them.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def admitted_handler(request: Request):
+            credentials = await security(request)
+            user = await run_db(get_current_user, credentials)
+            async with upload_admission.admit(user['id']):
+                return await handler(request)
+
+        return admitted_handler
@@ -0,0 +1,294 @@
+import logging
+import os
+import time
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from psycopg2.errors import DeadlockDetected, SerializationFailure
+from psycopg2.extras import RealDictCursor
+from auth import get_current_user
+from database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+ANALYTICS_MAX_TOP_SKILLS = int(os.getenv("ANALYTICS_MAX_TOP_SKILLS", "100"))
+ANALYTICS_MAX_BUCKETS = int(os.getenv("ANALYTICS_MAX_BUCKETS", "366"))
+
+BUCKETS = ("day", "week", "month")
+DIMENSIONS = ("status", "skill", "experience")
+
+# Attempts per day or dimension when a concurrent write conflicts with the recount
+RECONCILE_RETRIES = 5
+
+# Router
+analytics_router = APIRouter()
+
+
+def _summarize(rows: list, top_skills: int, experience_bin: int) -> dict:
+    """Status counts, top skills and the experience histogram from (dimension, value, count) rows"""
+    statuses = {}
+    skills = []
+    experience = {}
+    for row in rows:
+        if row['dimension'] == 'status':
+            statuses[row['value']] = row['count']
+        elif row['dimension'] == 'skill':
+            skills.append((row['value'], row['count']))
+        elif row['dimension'] == 'experience':
+            years = int(row['value']) // experience_bin * experience_bin
+            experience[years] = experience.get(years, 0) + row['count']
+    skills.sort(key=lambda skill: (-skill[1], skill[0]))
+    return {
+        "total": sum(statuses.values()),
+        "by_status": statuses,
+        "top_skills": [{"skill": skill, "count": count} for skill, count in skills[:top_skills]],
+        "experience_histogram": [
+            {"min_years": years, "max_years": years + experience_bin - 1, "count": experience[years]}
+            for years in sorted(experience)
+        ],
+    }
+
+
+def resume_summary(
+    top_skills: int = 20,
+    experience_bin: int = 1,
+    bucket: Optional[str] = None,
+    uploaded_after: Optional[date] = None,
+    uploaded_before: Optional[date] = None,
+) -> dict:
+    """
+    Aggregate counts from ``resume_stats``, or from ``resume_stats_daily``
+    when a date range or time bucket is asked for
+
+    Only the ``top_skills`` most common skills (per bucket) leave the
+    database; the other dimensions have a handful of values each.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            if not (bucket or uploaded_after or uploaded_before):
+                # Top skills are read in order from idx_resume_stats_top
+                cursor.execute("""
+                    (SELECT dimension, value, count FROM resume_stats
+                     WHERE dimension <> 'skill' AND count > 0)
+                    UNION ALL
+                    (SELECT dimension, value, count FROM resume_stats
+                     WHERE dimension = 'skill' AND count > 0
+                     ORDER BY count DESC, value
+                     LIMIT %s)
+                """, (top_skills,))
+                summary = _summarize(cursor.fetchall(), top_skills, experience_bin)
+                conn.commit()
+                return summary
+
+            conditions = ["count > 0"]
+            params = []
+            if uploaded_after:
+                conditions.append("day >= %s")
+                params.append(uploaded_after)
+            if uploaded_before:
+                conditions.append("day < %s")
+                params.append(uploaded_before)
+            where = " AND ".join(conditions)
+
+            cursor.execute(f"""
+                WITH totals AS (
+                    SELECT dimension, value, sum(count)::integer AS count
+                    FROM resume_stats_daily
+                    WHERE {where}
+                    GROUP BY dimension, value
+                )
+                (SELECT dimension, value, count FROM totals WHERE dimension <> 'skill')
+                UNION ALL
+                (SELECT dimension, value, count FROM totals WHERE dimension = 'skill'
+                 ORDER BY count DESC, value
+                 LIMIT %s)
+            """, params + [top_skills])
+            summary = _summarize(cursor.fetchall(), top_skills, experience_bin)
+
+            if bucket:
+                cursor.execute(f"""
+                    WITH totals AS (
+                        SELECT date_trunc(%s, day)::date AS bucket, dimension, value, sum(count)::integer AS count
+                        FROM resume_stats_daily
+                        WHERE {where}
+                        GROUP BY 1, dimension, value
+                    ), ranked AS (
+                        SELECT *, row_number() OVER (PARTITION BY bucket, dimension ORDER BY count DESC, value) AS rank
+                        FROM totals
+                    )
+                    SELECT bucket, dimension, value, count
+                    FROM ranked
+                    WHERE dimension <> 'skill' OR rank <= %s
+                    ORDER BY bucket
+                """, [bucket] + params + [top_skills])
+                by_bucket = {}
+                for row in cursor.fetchall():
+                    by_bucket.setdefault(row['bucket'], []).append(row)
+                if len(by_bucket) > ANALYTICS_MAX_BUCKETS:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Too many {bucket} buckets ({len(by_bucket)}); narrow the date range or use a wider bucket"
+                    )
+                summary["bucket"] = bucket
+                summary["buckets"] = [
+                    {"start": start, **_summarize(rows, top_skills, experience_bin)}
+                    for start, rows in by_bucket.items()
+                ]
+            conn.commit()
+    return summary
+
+
+# Recount one day of resume_stats_daily; returns (rows corrected, nonzero rows removed)
+RECONCILE_DAY_SQL = """
+    WITH actual AS (
+        SELECT f.dimension, f.value, count(*)::integer AS count
+        FROM resumes r, resume_stat_facts(r.analysis_status, r.skill_keys, r.experience_years) f
+        WHERE r.uploaded_at >= %(day)s AND r.uploaded_at < %(day)s + 1
+        GROUP BY 1, 2
+    ), fixed AS (
+        INSERT INTO resume_stats_daily AS s (day, dimension, value, count)
+        SELECT %(day)s, a.dimension, a.value, a.count
+        FROM actual a
+        LEFT JOIN resume_stats_daily s ON s.day = %(day)s AND s.dimension = a.dimension AND s.value = a.value
+        WHERE s.count IS DISTINCT FROM a.count
+        ORDER BY a.dimension, a.value
+        ON CONFLICT (dimension, day, value) DO UPDATE SET count = EXCLUDED.count
+        RETURNING 1
+    ), removed AS (
+        DELETE FROM resume_stats_daily s
+        WHERE s.day = %(day)s
+          AND NOT EXISTS (SELECT 1 FROM actual a WHERE a.dimension = s.dimension AND a.value = s.value)
+        RETURNING s.count
+    )
+    SELECT (SELECT count(*) FROM fixed), (SELECT count(*) FROM removed WHERE count <> 0)
+"""
+
+# Recount one dimension of resume_stats; returns (rows corrected, nonzero rows removed)
+RECONCILE_DIMENSION_SQL = """
+    WITH actual AS (
+        SELECT f.value, count(*)::integer AS count
+        FROM resumes r, resume_stat_facts(r.analysis_status, r.skill_keys, r.experience_years) f
+        WHERE f.dimension = %(dimension)s
+        GROUP BY 1
+    ), fixed AS (
+        INSERT INTO resume_stats AS s (dimension, value, count)
+        SELECT %(dimension)s, a.value, a.count
+        FROM actual a
+        LEFT JOIN resume_stats s ON s.dimension = %(dimension)s AND s.value = a.value
+        WHERE s.count IS DISTINCT FROM a.count
+        ORDER BY a.value
+        ON CONFLICT (dimension, value) DO UPDATE SET count = EXCLUDED.count
+        RETURNING 1
+    ), removed AS (
+        DELETE FROM resume_stats s
+        WHERE s.dimension = %(dimension)s
+          AND NOT EXISTS (SELECT 1 FROM actual a WHERE a.value = s.value)
+        RETURNING s.count
+    )
+    SELECT (SELECT count(*) FROM fixed), (SELECT count(*) FROM removed WHERE count <> 0)
+"""
+
+
+def _reconcile(conn, sql: str, params: dict):
+    """
+    Run one recount in its own REPEATABLE READ transaction; drift fixed, or None if it kept conflicting
+
+    The recount and the aggregates it corrects are read from one snapshot,
+    and a trigger's change to a corrected row after that snapshot makes the
+    write fail instead of being overwritten, so the recount is retried.
+    Rows are written in key order, as the triggers do.
+    """
+    for _ in range(RECONCILE_RETRIES):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cursor.execute(sql, params)
+                fixed, removed = cursor.fetchone()
+            conn.commit()
+            # Rows whose count fell to 0 are cleaned up too, but they are not drift
+            return fixed + removed
+        except (SerializationFailure, DeadlockDetected):
+            conn.rollback()
+    logger.warning("Gave up recounting resume stats for %s after %s conflicts", params, RECONCILE_RETRIES)
+    return None
+
+
+def reconcile_resume_stats() -> dict:
+    """
+    Recount the aggregate tables from ``resumes`` and fix any drift
+
+    Each day of ``resume_stats_daily`` and each dimension of ``resume_stats``
+    is recounted in its own short transaction, without locking either table,
+    so uploads and analysis results carry on while it runs.
+    """
+    started = time.monotonic()
+    daily_fixed = 0
+    totals_fixed = 0
+    skipped = 0
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT DISTINCT uploaded_at::date FROM resumes WHERE uploaded_at IS NOT NULL
+                UNION
+                SELECT DISTINCT day FROM resume_stats_daily
+                ORDER BY 1
+            """)
+            days = [day for (day,) in cursor.fetchall()]
+            cursor.execute("SELECT DISTINCT dimension FROM resume_stats")
+            dimensions = sorted(set(DIMENSIONS) | {dimension for (dimension,) in cursor.fetchall()})
+        conn.commit()
+
+        for day in days:
+            fixed = _reconcile(conn, RECONCILE_DAY_SQL, {"day": day})
+            if fixed is None:
+                skipped += 1
+            else:
+                daily_fixed += fixed
+        for dimension in dimensions:
+            fixed = _reconcile(conn, RECONCILE_DIMENSION_SQL, {"dimension": dimension})
+            if fixed is None:
+                skipped += 1
+            else:
+                totals_fixed += fixed
+
+    result = {
+        "totals_fixed": totals_fixed,
+        "daily_fixed": daily_fixed,
+        "skipped": skipped,
+        "took_seconds": round(time.monotonic() - started, 2),
+    }
+    if totals_fixed or daily_fixed:
+        logger.warning("Resume stats had drifted and were corrected: %s", result)
+    return result
+
+
+@analytics_router.get("/analytics/summary")
+def get_analytics_summary(
+    top_skills: int = Query(20, ge=1, le=ANALYTICS_MAX_TOP_SKILLS),
+    experience_bin: int = Query(1, ge=1, le=50, description="years per histogram bin"),
+    bucket: Optional[str] = Query(None, description="day, week or month of uploaded_at (UTC)"),
+    uploaded_after: Optional[date] = None,
+    uploaded_before: Optional[date] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Dashboard counts: resumes by status, most common skills and the experience histogram
+
+    Skills and experience count completed resumes only. Served from aggregate
+    tables that the database keeps up to date on every change to `resumes`,
+    so the cost does not grow with the number of resumes.
+
+    - **bucket**: also break the counts down by `day`, `week` or `month` of upload
+    - **uploaded_after** / **uploaded_before**: date range of `uploaded_at` (inclusive / exclusive)
+    """
+    if bucket and bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Unsupported bucket '{bucket}'. Use one of: {', '.join(BUCKETS)}")
+    if uploaded_after and uploaded_before and uploaded_after >= uploaded_before:
+        raise HTTPException(status_code=400, detail="uploaded_after must be before uploaded_before")
+    try:
+        return resume_summary(top_skills, experience_bin, bucket, uploaded_after, uploaded_before)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error computing analytics: {str(e)}")
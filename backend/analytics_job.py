@@ -0,0 +1,22 @@
+import logging
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from database import init_db_pool, close_db_pool
+from analytics import reconcile_resume_stats
+
+logger = logging.getLogger(__name__)
+
+def main():
+    """Recount the analytics aggregates and fix drift; run periodically, e.g. nightly from cron"""
+    init_db_pool()
+    try:
+        logger.info("Resume stats reconciled: %s", reconcile_resume_stats())
+    finally:
+        close_db_pool()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1 @@
+"""Load tests for a running Resume Analyzer API"""
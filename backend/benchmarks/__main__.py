@@ -0,0 +1,142 @@
+"""
+Run the benchmark scenarios against a live API, or compare two result files
+
+    python -m benchmarks run --url http://localhost:8000 --output results.json
+    python -m benchmarks run --scenario list_depth --scenario ingestion
+    python -m benchmarks compare baseline.json results.json --threshold 0.1
+
+``compare`` exits with status 1 when any p95 latency grew, or any
+throughput dropped, by more than the threshold.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+import aiohttp
+from benchmarks.harness import ApiContext
+from benchmarks.scenarios import SCENARIOS
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        ctx = ApiContext(session, args.url, args.username, args.password, args.duration, args.concurrency)
+        ctx.depths = args.depths
+        ctx.logins = args.logins
+        ctx.batch_size = args.batch_size
+        await ctx.login()
+
+        results = {}
+        for name in args.scenario or list(SCENARIOS):
+            print(f"running {name}...", file=sys.stderr)
+            results[name] = await SCENARIOS[name](ctx)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "url": args.url,
+            "python": platform.python_version(),
+            "settings": {
+                "duration": args.duration,
+                "concurrency": args.concurrency,
+                "depths": args.depths,
+                "logins": args.logins,
+                "batch_size": args.batch_size,
+            },
+        },
+        "scenarios": results,
+    }
+
+
+def _metrics(node, path=()):
+    """Flatten results to {"scenario.phase.metric": value} for throughput and p95"""
+    if not isinstance(node, dict):
+        return {}
+    metrics = {}
+    for key, value in node.items():
+        if key in ("throughput_per_s", "rows_per_s", "p95_ms"):
+            metrics[".".join(path + (key,))] = value
+        else:
+            metrics.update(_metrics(value, path + (key,)))
+    return metrics
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """One row per shared metric: (name, baseline, current, relative change, regressed)"""
+    before = _metrics(baseline["scenarios"])
+    after = _metrics(current["scenarios"])
+    rows = []
+    for name in sorted(before.keys() & after.keys()):
+        old, new = before[name], after[name]
+        if not old:
+            continue
+        change = (new - old) / old
+        # Latency regresses upwards, throughput downwards
+        regressed = change > threshold if name.endswith("p95_ms") else change < -threshold
+        rows.append((name, old, new, change, regressed))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run scenarios and write JSON results")
+    run_parser.add_argument("--url", default="http://localhost:8000")
+    run_parser.add_argument("--username", default="benchmark")
+    run_parser.add_argument("--password", default="benchmark-password")
+    run_parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="repeatable; default all")
+    run_parser.add_argument("--duration", type=float, default=10.0, help="seconds per measured phase")
+    run_parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients per phase")
+    run_parser.add_argument("--depths", type=lambda value: [int(d) for d in value.split(",")], default=[0, 1000, 10000],
+                            help="listing depths for list_depth, comma separated")
+    run_parser.add_argument("--logins", type=int, default=50, help="concurrent login clients in login_storm")
+    run_parser.add_argument("--batch-size", type=int, default=100, help="results per batch webhook call")
+    run_parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    run_parser.add_argument("--output", help="file for the JSON results (default: stdout)")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="tolerated relative change")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        output = json.dumps(asyncio.run(run(args)), indent=2)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(output + "\n")
+        else:
+            print(output)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows = compare(baseline, current, args.threshold)
+    for name, old, new, change, regressed in rows:
+        print(f"{'REGRESSED' if regressed else 'ok':<10} {name:<60} {old:>12} -> {new:<12} {change:+.1%}")
+    regressions = sum(1 for row in rows if row[4])
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0%} "
+          f"({baseline['meta'].get('commit')} -> {current['meta'].get('commit')})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Fixture resumes for the upload scenarios, generated rather than checked in
+
+Every call returns a unique document (the candidate number is part of the
+text), so uploads are not short-circuited by content-hash deduplication.
+"""
+import io
+
+SIZES = {"small": 1, "medium": 5, "large": 30}
+
+SKILLS = ["Python", "PostgreSQL", "Docker", "Kubernetes", "React", "AWS", "Terraform", "Go"]
+
+FILLER = (
+    "Delivered features across the stack, reviewed code, mentored engineers "
+    "and improved reliability of production services."
+)
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def resume_lines(number: int, page: int) -> list:
+    if page == 0:
+        skills = ", ".join(SKILLS[number % 4:number % 4 + 4])
+        return [
+            f"Candidate {number}",
+            f"candidate{number}@example.com",
+            f"+1 555 {number % 1000:03d} {number % 10000:04d}",
+            "Senior Software Engineer",
+            f"{number % 15 + 1} years of experience",
+            "Skills",
+            skills,
+        ] + [FILLER] * 30
+    return [f"Experience, page {page + 1}"] + [FILLER] * 45
+
+
+def resume_pdf(number: int, size: str = "small") -> bytes:
+    """A text PDF with SIZES[size] pages for candidate ``number``"""
+    pages = SIZES[size]
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for page in range(pages):
+        page_id, content_id = 4 + page * 2, 5 + page * 2
+        text = " ".join(f"({_escape(line)}) Tj T*" for line in resume_lines(number, page))
+        content = f"BT /F1 10 Tf 50 780 Td 14 TL {text} ET".encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream"
+        objects[page_id] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 3 0 R >> >> >>" % content_id
+        )
+        kids.append(b"%d 0 R" % page_id)
+    objects[2] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % pages
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = out.tell()
+        out.write(b"%d 0 obj\n" % object_id + objects[object_id] + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for object_id in sorted(objects):
+        out.write(b"%010d 00000 n \n" % offsets[object_id])
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+if __name__ == "__main__":
+    # Write one of each size for manual testing: python -m benchmarks.fixtures [directory]
+    import os
+    import sys
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else "."
+    for size in SIZES:
+        path = os.path.join(directory, f"resume-{size}.pdf")
+        with open(path, "wb") as f:
+            f.write(resume_pdf(1, size))
+        print(path)
@@ -0,0 +1,90 @@
+"""Shared pieces of the benchmark scenarios: timing, percentiles and the API session"""
+import asyncio
+import time
+from collections import Counter
+import aiohttp
+
+
+def percentiles(samples: list) -> dict:
+    """p50/p95/p99/max in milliseconds for a list of durations in seconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(p):
+        return round(ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)] * 1000, 2)
+
+    return {"count": len(ordered), "p50_ms": pick(50), "p95_ms": pick(95), "p99_ms": pick(99), "max_ms": pick(100)}
+
+
+class Recorder:
+    """Latencies and status codes of one group of requests"""
+
+    def __init__(self):
+        self.samples = []
+        self.status_codes = Counter()
+        self.errors = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    async def request(self, session, method: str, url: str, **kwargs):
+        """Send a request, record its latency and status, and return (status, body)"""
+        started = time.perf_counter()
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                body = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.errors += 1
+            return None, b""
+        self.samples.append(time.perf_counter() - started)
+        self.status_codes[response.status] += 1
+        return response.status, body
+
+    def result(self, items: int = None) -> dict:
+        """Summary; ``items`` overrides the request count for throughput (e.g. rows per batch)"""
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        count = len(self.samples) if items is None else items
+        return {
+            "throughput_per_s": round(count / elapsed, 2) if elapsed > 0 else 0,
+            "latency": percentiles(self.samples),
+            "status_codes": {str(code): total for code, total in sorted(self.status_codes.items())},
+            "errors": self.errors,
+        }
+
+
+async def run_clients(concurrency: int, duration: float, client) -> None:
+    """Run ``client(worker_id, deadline)`` on ``concurrency`` tasks until ``duration`` seconds pass"""
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(client(worker_id, deadline) for worker_id in range(concurrency)))
+
+
+class ApiContext:
+    """Session, base URL and credentials shared by the scenarios"""
+
+    def __init__(self, session, url: str, username: str, password: str, duration: float, concurrency: int):
+        self.session = session
+        self.url = url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.duration = duration
+        self.concurrency = concurrency
+        self.headers = {}
+
+    async def login(self) -> None:
+        credentials = {"username": self.username, "password": self.password}
+        async with self.session.post(f"{self.url}/auth/login", json=credentials) as response:
+            if response.status == 200:
+                self.headers = {"Authorization": f"Bearer {(await response.json())['access_token']}"}
+                return
+            if response.status != 401:
+                response.raise_for_status()
+        # Fresh database: create the benchmark user first
+        async with self.session.post(f"{self.url}/auth/register", json={
+            **credentials, "email": f"{self.username}@benchmark.local"
+        }) as response:
+            # 400 means another simulated user registered it first
+            if response.status != 400:
+                response.raise_for_status()
+        async with self.session.post(f"{self.url}/auth/login", json=credentials) as response:
+            response.raise_for_status()
+            self.headers = {"Authorization": f"Bearer {(await response.json())['access_token']}"}
@@ -0,0 +1,84 @@
+"""
+Local stand-in for the n8n resume-upload webhook
+
+Answers after a configurable latency, fails a configurable fraction of
+requests with 500, and can call the API's analysis-complete webhook the
+way the real workflow does. Point the API at it with
+N8N_WEBHOOK_URL=http://localhost:5679/webhook/resume-upload:
+
+    python -m benchmarks.n8n_stub --latency 0.5 --failure-rate 0.05 \\
+        --callback-url http://localhost:8000/api/webhook/analysis-complete
+"""
+import argparse
+import asyncio
+import random
+from collections import Counter
+import aiohttp
+from aiohttp import web
+
+
+def create_app(latency: float, jitter: float, failure_rate: float, callback_url: str = None) -> web.Application:
+    stats = Counter()
+    background = set()
+
+    async def call_back(payload: dict) -> None:
+        results = {
+            "resume_id": payload.get("resume_id"),
+            "analysis_results": {
+                "full_name": f"Stub Candidate {payload.get('resume_id')}",
+                "email": f"stub{payload.get('resume_id')}@example.com",
+                "skills": ["Python", "PostgreSQL"],
+                "experience_years": 5,
+                "last_job_title": "Software Engineer",
+            },
+        }
+        try:
+            async with app["session"].post(callback_url, json=results) as response:
+                stats[f"callback_{response.status}"] += 1
+        except aiohttp.ClientError:
+            stats["callback_error"] += 1
+
+    async def resume_upload(request: web.Request) -> web.Response:
+        payload = await request.json()
+        stats["received"] += 1
+        await asyncio.sleep(max(latency + random.uniform(-jitter, jitter), 0))
+        if random.random() < failure_rate:
+            stats["failed"] += 1
+            return web.json_response({"success": False, "error": "stub failure"}, status=500)
+        stats["succeeded"] += 1
+        if callback_url:
+            task = asyncio.create_task(call_back(payload))
+            background.add(task)
+            task.add_done_callback(background.discard)
+        return web.json_response({"success": True, "resume_id": payload.get("resume_id")})
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(dict(stats))
+
+    async def open_session(app: web.Application) -> None:
+        app["session"] = aiohttp.ClientSession()
+
+    async def close_session(app: web.Application) -> None:
+        await app["session"].close()
+
+    app = web.Application()
+    app.router.add_post("/webhook/resume-upload", resume_upload)
+    app.router.add_get("/stats", get_stats)
+    app.on_startup.append(open_session)
+    app.on_cleanup.append(close_session)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the n8n resume-upload webhook")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5679)
+    parser.add_argument("--latency", type=float, default=0.2, help="mean response time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="+/- seconds around the mean")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--callback-url", help="analysis-complete webhook to call after each success")
+    args = parser.parse_args()
+    web.run_app(
+        create_app(args.latency, args.jitter, args.failure_rate, args.callback_url),
+        host=args.host, port=args.port
+    )
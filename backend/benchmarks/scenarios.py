@@ -0,0 +1,218 @@
+"""
+Benchmark scenarios
+
+Each scenario is an ``async def scenario(ctx) -> dict`` run against a live
+API; the dict holds throughput and latency summaries from ``Recorder.result``.
+Scenarios write to the database (uploads, analysis results), so run them
+against a benchmark database rather than real data.
+"""
+import asyncio
+import json
+import random
+import time
+import aiohttp
+from benchmarks.fixtures import SIZES, resume_pdf
+from benchmarks.harness import Recorder, run_clients
+
+# Candidate numbers unique to this run, so repeated runs are not deduplicated
+_candidate_numbers = iter(range(int(time.time() * 1000) % 10**9, 10**12))
+
+
+async def _resume_ids(ctx, count: int) -> list:
+    """Ids of up to ``count`` recent resumes, walking the listing with the keyset cursor"""
+    ids = []
+    cursor = None
+    while len(ids) < count:
+        params = {"limit": 100, "fields": "id"}
+        if cursor:
+            params["cursor"] = cursor
+        async with ctx.session.get(f"{ctx.url}/resumes", params=params, headers=ctx.headers) as response:
+            response.raise_for_status()
+            page = await response.json()
+        ids.extend(resume["id"] for resume in page["resumes"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    return ids[:count]
+
+
+async def _cursor_at(ctx, depth: int):
+    """The keyset cursor whose page starts ``depth`` resumes into the listing"""
+    cursor = None
+    walked = 0
+    while walked < depth:
+        params = {"limit": min(100, depth - walked), "fields": "id"}
+        if cursor:
+            params["cursor"] = cursor
+        async with ctx.session.get(f"{ctx.url}/resumes", params=params, headers=ctx.headers) as response:
+            response.raise_for_status()
+            page = await response.json()
+        walked += len(page["resumes"])
+        cursor = page["next_cursor"]
+    return cursor
+
+
+async def _upload(ctx, recorder: Recorder, size: str):
+    form = aiohttp.FormData()
+    number = next(_candidate_numbers)
+    form.add_field("file", resume_pdf(number, size), filename=f"candidate-{number}.pdf", content_type="application/pdf")
+    status, body = await recorder.request(ctx.session, "POST", f"{ctx.url}/api/upload", data=form, headers=ctx.headers)
+    return json.loads(body)["resume_id"] if status in (201, 202) else None
+
+
+async def upload(ctx) -> dict:
+    """POST /api/upload with small, medium and large PDFs"""
+    result = {}
+    for size in SIZES:
+        recorder = Recorder()
+
+        async def client(worker_id, deadline):
+            while time.monotonic() < deadline:
+                await _upload(ctx, recorder, size)
+
+        await run_clients(ctx.concurrency, ctx.duration, client)
+        recorder.finished = time.perf_counter()
+        result[size] = {"pages": SIZES[size], **recorder.result()}
+    return result
+
+
+async def list_depth(ctx) -> dict:
+    """GET /resumes at increasing depths: keyset cursor against OFFSET (skip)"""
+    available = len(await _resume_ids(ctx, max(ctx.depths) + 1))
+    result = {}
+    for depth in ctx.depths:
+        if depth >= available:
+            result[str(depth)] = {"skipped": f"only {available} resumes"}
+            continue
+        cursor = await _cursor_at(ctx, depth)
+        result[str(depth)] = {}
+        for mode, params in (("cursor", {"cursor": cursor} if cursor else {}), ("skip", {"skip": depth})):
+            recorder = Recorder()
+            params = {"limit": 20, **params}
+
+            async def client(worker_id, deadline):
+                while time.monotonic() < deadline:
+                    await recorder.request(ctx.session, "GET", f"{ctx.url}/resumes", params=params, headers=ctx.headers)
+
+            await run_clients(ctx.concurrency, ctx.duration, client)
+            recorder.finished = time.perf_counter()
+            result[str(depth)][mode] = recorder.result()
+    return result
+
+
+async def status_polling(ctx) -> dict:
+    """GET /api/upload/status/{id} across recent resumes, the way the frontend polls"""
+    ids = await _resume_ids(ctx, 200)
+    if not ids:
+        recorder = Recorder()
+        ids = [resume_id for resume_id in [await _upload(ctx, recorder, "small") for _ in range(20)] if resume_id]
+    recorder = Recorder()
+
+    async def client(worker_id, deadline):
+        while time.monotonic() < deadline:
+            url = f"{ctx.url}/api/upload/status/{random.choice(ids)}"
+            await recorder.request(ctx.session, "GET", url, headers=ctx.headers)
+
+    await run_clients(ctx.concurrency, ctx.duration, client)
+    recorder.finished = time.perf_counter()
+    return {"resumes": len(ids), **recorder.result()}
+
+
+async def _probe_phase(ctx, storm: bool) -> dict:
+    probes = {"/": Recorder(), "/resumes": Recorder()}
+    logins = Recorder()
+    deadline = time.monotonic() + ctx.duration
+
+    async def probe(path):
+        while time.monotonic() < deadline:
+            await probes[path].request(ctx.session, "GET", f"{ctx.url}{path}", headers=ctx.headers)
+            await asyncio.sleep(0.01)
+
+    async def log_in():
+        credentials = {"username": ctx.username, "password": ctx.password}
+        while time.monotonic() < deadline:
+            status, _ = await logins.request(ctx.session, "POST", f"{ctx.url}/auth/login", json=credentials)
+            if status == 503:
+                await asyncio.sleep(0.05)
+
+    tasks = [probe(path) for path in probes for _ in range(2)]
+    if storm:
+        tasks += [log_in() for _ in range(ctx.logins)]
+    await asyncio.gather(*tasks)
+
+    result = {path: recorder.result() for path, recorder in probes.items()}
+    if storm:
+        result["logins"] = logins.result()
+    return result
+
+
+async def login_storm(ctx) -> dict:
+    """Latency of GET / and GET /resumes on an idle server, then during a flood of logins"""
+    return {
+        "idle": await _probe_phase(ctx, storm=False),
+        "storm": await _probe_phase(ctx, storm=True),
+    }
+
+
+def _analysis_item(resume_id: int) -> dict:
+    return {
+        "resume_id": resume_id,
+        "analysis_results": {
+            "full_name": f"Benchmark Candidate {resume_id}",
+            "email": f"benchmark{resume_id}@example.com",
+            "skills": random.sample(["Python", "PostgreSQL", "Docker", "React", "AWS", "Go"], 3),
+            "experience_years": random.randint(0, 20),
+            "last_job_title": "Software Engineer",
+        },
+    }
+
+
+async def ingestion(ctx) -> dict:
+    """analysis-complete results per second, one webhook call per result against the batch webhook"""
+    ids = await _resume_ids(ctx, ctx.batch_size * ctx.concurrency)
+    if not ids:
+        return {"skipped": "no resumes to update"}
+
+    single = Recorder()
+
+    async def single_client(worker_id, deadline):
+        while time.monotonic() < deadline:
+            url = f"{ctx.url}/api/webhook/analysis-complete"
+            await single.request(ctx.session, "POST", url, json=_analysis_item(random.choice(ids)))
+
+    await run_clients(ctx.concurrency, ctx.duration, single_client)
+    single.finished = time.perf_counter()
+
+    batch = Recorder()
+    rows = 0
+    # Disjoint ids per client: overlapping concurrent batches would just measure lock waits
+    clients = min(ctx.concurrency, len(ids))
+    partitions = [ids[worker_id::clients] for worker_id in range(clients)]
+    batch_size = min(ctx.batch_size, min(len(partition) for partition in partitions))
+
+    async def batch_client(worker_id, deadline):
+        nonlocal rows
+        while time.monotonic() < deadline:
+            items = [_analysis_item(resume_id) for resume_id in random.sample(partitions[worker_id], batch_size)]
+            url = f"{ctx.url}/api/webhook/analysis-complete/batch"
+            status, _ = await batch.request(ctx.session, "POST", url, json={"results": items})
+            if status == 200:
+                rows += len(items)
+
+    await run_clients(clients, ctx.duration, batch_client)
+    batch.finished = time.perf_counter()
+
+    single_result = single.result()
+    return {
+        "single": {**single_result, "rows_per_s": single_result["throughput_per_s"]},
+        "batch": {**batch.result(), "batch_size": batch_size, "rows_per_s": batch.result(rows)["throughput_per_s"]},
+    }
+
+
+SCENARIOS = {
+    "upload": upload,
+    "list_depth": list_depth,
+    "status_polling": status_polling,
+    "login_storm": login_storm,
+    "ingestion": ingestion,
+}
@@ -0,0 +1,62 @@
+import os
+import threading
+import time
+
+# Configuration
+RESUME_COUNT_TTL = float(os.getenv("RESUME_COUNT_TTL", "30"))
+RESUME_COUNT_EXACT_LIMIT = int(os.getenv("RESUME_COUNT_EXACT_LIMIT", "100000"))
+
+
+class CachedCount:
+    """
+    Row count of a table, cached in-process for ``ttl`` seconds.
+
+    On refresh the planner's estimate (``pg_class.reltuples``) is read first;
+    a full ``COUNT(*)`` is only run while the table is smaller than
+    ``exact_limit`` rows. Inserts made by this process are added to the cached
+    value straight away so it does not lag behind until the next refresh.
+    """
+
+    def __init__(self, table: str, ttl: float, exact_limit: int):
+        self.table = table
+        self.ttl = ttl
+        self.exact_limit = exact_limit
+        self._lock = threading.Lock()
+        self._value = None
+        self._is_estimate = False
+        self._expires_at = 0.0
+
+    def get(self, cursor) -> tuple:
+        """Return (count, is_estimate), refreshing through ``cursor`` when stale"""
+        with self._lock:
+            if self._value is not None and time.monotonic() < self._expires_at:
+                return self._value, self._is_estimate
+
+        cursor.execute("SELECT reltuples::bigint AS estimate FROM pg_class WHERE oid = %s::regclass", (self.table,))
+        row = cursor.fetchone()
+        estimate = row['estimate'] if isinstance(row, dict) else row[0]
+        if estimate is not None and estimate > self.exact_limit:
+            value, is_estimate = estimate, True
+        else:
+            cursor.execute(f"SELECT COUNT(*) AS count FROM {self.table}")
+            row = cursor.fetchone()
+            value, is_estimate = (row['count'] if isinstance(row, dict) else row[0]), False
+
+        with self._lock:
+            self._value = value
+            self._is_estimate = is_estimate
+            self._expires_at = time.monotonic() + self.ttl
+        return value, is_estimate
+
+    def add(self, delta: int) -> None:
+        """Adjust the cached value after this process inserted or deleted rows"""
+        with self._lock:
+            if self._value is not None:
+                self._value += delta
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._value = None
+
+
+resume_count = CachedCount("resumes", ttl=RESUME_COUNT_TTL, exact_limit=RESUME_COUNT_EXACT_LIMIT)
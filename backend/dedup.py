@@ -0,0 +1,376 @@
+import hashlib
+import logging
+import os
+import re
+import time
+import zlib
+from typing import Optional
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
+from psycopg2.extras import RealDictCursor, execute_values
+from auth import get_current_user
+from database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))  # MinHash values per signature
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", "16"))  # LSH bands; must divide DEDUP_NUM_PERM
+DEDUP_SHINGLE_WORDS = int(os.getenv("DEDUP_SHINGLE_WORDS", "3"))
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))  # estimated Jaccard similarity
+DEDUP_MAX_CANDIDATES = int(os.getenv("DEDUP_MAX_CANDIDATES", "1000"))  # per lookup, and per LSH bucket when clustering
+DEDUP_BATCH_SIZE = int(os.getenv("DEDUP_BATCH_SIZE", "1000"))
+
+if DEDUP_NUM_PERM % DEDUP_BANDS:
+    raise ValueError("DEDUP_NUM_PERM must be a multiple of DEDUP_BANDS")
+
+WORD_RE = re.compile(r"\w+")
+
+# Universal hashes (a * x + b) mod p; fixed seed, since stored signatures must stay comparable
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_permutations = np.random.RandomState(1).randint(1, 1 << 31, size=(2, DEDUP_NUM_PERM)).astype(np.uint64)
+PERM_A, PERM_B = _permutations
+
+# Router
+dedup_router = APIRouter()
+
+
+def shingles(text: str) -> np.ndarray:
+    """32-bit hashes of the distinct word n-grams of ``text``"""
+    words = WORD_RE.findall((text or "").lower())
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    size = min(DEDUP_SHINGLE_WORDS, len(words))
+    hashes = {
+        zlib.crc32(" ".join(words[i:i + size]).encode())
+        for i in range(len(words) - size + 1)
+    }
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """MinHash signature (``DEDUP_NUM_PERM`` uint32 values) of ``text``, or None when it has no words"""
+    values = shingles(text)
+    if not len(values):
+        return None
+    signature = np.full(DEDUP_NUM_PERM, 0xFFFFFFFF, dtype=np.uint64)
+    # Chunked so a long resume does not allocate a (shingles x permutations) matrix at once
+    for start in range(0, len(values), 4096):
+        chunk = values[start:start + 4096, None]
+        hashed = (chunk * PERM_A + PERM_B) % MERSENNE_PRIME & np.uint64(0xFFFFFFFF)
+        np.minimum(signature, hashed.min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+
+def lsh_bands(signature: np.ndarray) -> list:
+    """One 64-bit hash per band of the signature; resumes sharing any of them are candidates"""
+    rows = DEDUP_NUM_PERM // DEDUP_BANDS
+    bands = []
+    for band in range(DEDUP_BANDS):
+        digest = hashlib.blake2b(
+            signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8, salt=band.to_bytes(2, "little")
+        ).digest()
+        bands.append(int.from_bytes(digest, "little", signed=True))
+    return bands
+
+
+def similarities(signature: np.ndarray, others: list) -> np.ndarray:
+    """Estimated Jaccard similarity of ``signature`` to each of the stored ``others`` (bytes)"""
+    matrix = np.frombuffer(b"".join(others), dtype="<u4").reshape(len(others), DEDUP_NUM_PERM)
+    return (matrix == signature).mean(axis=1)
+
+
+def _decode(stored) -> np.ndarray:
+    return np.frombuffer(bytes(stored), dtype="<u4")
+
+
+def store_signatures(cursor, texts: list) -> int:
+    """
+    Upsert the signatures of (resume_id, raw_text) pairs, in the caller's transaction
+
+    Resumes without any text get no signature (and lose a stale one); a
+    changed resume leaves its cluster until the next clustering run.
+    """
+    rows = []
+    empty = []
+    for resume_id, text in texts:
+        signature = minhash(text)
+        if signature is None:
+            empty.append(resume_id)
+        else:
+            rows.append((resume_id, signature.astype("<u4").tobytes(), lsh_bands(signature)))
+    if empty:
+        cursor.execute("DELETE FROM resume_signatures WHERE resume_id = ANY(%s)", (empty,))
+    if rows:
+        execute_values(cursor, """
+            INSERT INTO resume_signatures (resume_id, signature, lsh_bands)
+            VALUES %s
+            ON CONFLICT (resume_id) DO UPDATE SET
+                signature = EXCLUDED.signature,
+                lsh_bands = EXCLUDED.lsh_bands,
+                cluster_id = NULL,
+                updated_at = NOW()
+        """, rows, template="(%s, %s, %s::bigint[])", page_size=len(rows))
+    return len(rows)
+
+
+def _signature_of(cursor, resume_id: int):
+    """The stored signature and bands of a resume, computed now if the resume predates them"""
+    cursor.execute(
+        "SELECT signature, lsh_bands, cluster_id FROM resume_signatures WHERE resume_id = %s", (resume_id,)
+    )
+    row = cursor.fetchone()
+    if row:
+        return _decode(row['signature']), row['lsh_bands'], row['cluster_id']
+
+    cursor.execute("SELECT raw_text FROM resumes WHERE id = %s", (resume_id,))
+    resume = cursor.fetchone()
+    if not resume:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    signature = minhash(resume['raw_text'])
+    if signature is None:
+        return None, None, None
+    store_signatures(cursor, [(resume_id, resume['raw_text'])])
+    return signature, lsh_bands(signature), None
+
+
+def find_duplicates(resume_id: int, threshold: float = DEDUP_THRESHOLD, limit: int = 20) -> dict:
+    """
+    Resumes whose text is estimated to be at least ``threshold`` similar
+
+    Only resumes sharing an LSH band with this one are compared, found
+    through the GIN index on ``lsh_bands``. When more than
+    ``DEDUP_MAX_CANDIDATES`` match, the ones sharing the most bands are
+    compared, so the answer does not change from one call to the next.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            signature, bands, cluster_id = _signature_of(cursor, resume_id)
+            if signature is None:
+                conn.commit()
+                return {"resume_id": resume_id, "cluster_id": None, "candidates": 0, "duplicates": []}
+
+            # Resumes sharing the most bands are the likeliest duplicates; keep those when a bucket overflows.
+            # Band hashes are salted with the band number, so they can only match position by position.
+            cursor.execute("""
+                SELECT resume_id, signature
+                FROM resume_signatures
+                WHERE lsh_bands && %s::bigint[] AND resume_id <> %s
+                ORDER BY (
+                    SELECT count(*) FROM unnest(lsh_bands, %s::bigint[]) AS band(stored, own) WHERE stored = own
+                ) DESC, resume_id
+                LIMIT %s
+            """, (bands, resume_id, bands, DEDUP_MAX_CANDIDATES))
+            candidates = cursor.fetchall()
+
+            duplicates = []
+            if candidates:
+                scores = similarities(signature, [bytes(row['signature']) for row in candidates])
+                similar = {
+                    row['resume_id']: round(float(score), 4)
+                    for row, score in zip(candidates, scores) if score >= threshold
+                }
+                ranked = sorted(similar, key=lambda other: (-similar[other], -other))[:limit]
+                if ranked:
+                    cursor.execute("""
+                        SELECT id, filename, full_name, email, phone, user_id, uploaded_at, analysis_status
+                        FROM resumes
+                        WHERE id = ANY(%s)
+                    """, (ranked,))
+                    resumes = {row['id']: row for row in cursor.fetchall()}
+                    duplicates = [
+                        {**resumes[other], "similarity": similar[other]} for other in ranked if other in resumes
+                    ]
+            conn.commit()
+    return {
+        "resume_id": resume_id,
+        "cluster_id": cluster_id,
+        "candidates": len(candidates),
+        "duplicates": duplicates,
+    }
+
+
+def backfill_signatures(batch_size: int = DEDUP_BATCH_SIZE) -> int:
+    """Sign completed resumes that have text but no signature (older rows, reused analyses)"""
+    signed = 0
+    last_id = 0
+    while True:
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT r.id, r.raw_text
+                    FROM resumes r
+                    LEFT JOIN resume_signatures s ON s.resume_id = r.id
+                    WHERE r.id > %s AND r.analysis_status = 'completed'
+                      AND r.raw_text IS NOT NULL AND s.resume_id IS NULL
+                    ORDER BY r.id
+                    LIMIT %s
+                """, (last_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    return signed
+                signed += store_signatures(cursor, rows)
+                conn.commit()
+        last_id = rows[-1][0]
+
+
+class _DisjointSet:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        parent = self.parent.setdefault(item, item)
+        while parent != item:
+            grandparent = self.parent.setdefault(parent, parent)
+            self.parent[item] = grandparent
+            item, parent = parent, grandparent
+        return item
+
+    def union(self, a, b) -> None:
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            # The smallest resume id names the cluster
+            self.parent[max(a, b)] = min(a, b)
+
+
+def cluster_duplicates(threshold: float = DEDUP_THRESHOLD, batch_size: int = DEDUP_BATCH_SIZE) -> dict:
+    """
+    Group near-duplicate resumes and store each group's smallest resume id as ``cluster_id``
+
+    Pairs are only verified within LSH buckets holding more than one resume,
+    so the work grows with the number of similar resumes rather than with
+    the square of the table. Buckets over ``DEDUP_MAX_CANDIDATES`` resumes
+    (typically boilerplate text) are skipped.
+    """
+    started = time.monotonic()
+    backfilled = backfill_signatures(batch_size)
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT array_agg(resume_id ORDER BY resume_id)
+                FROM resume_signatures, unnest(lsh_bands) AS bucket
+                GROUP BY bucket
+                HAVING count(*) > 1
+            """)
+            buckets = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+
+    oversized = sum(1 for bucket in buckets if len(bucket) > DEDUP_MAX_CANDIDATES)
+    buckets = [bucket for bucket in buckets if len(bucket) <= DEDUP_MAX_CANDIDATES]
+    members = sorted({resume_id for bucket in buckets for resume_id in bucket})
+
+    signatures = {}
+    for start in range(0, len(members), batch_size):
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT resume_id, signature FROM resume_signatures WHERE resume_id = ANY(%s)",
+                    (members[start:start + batch_size],)
+                )
+                signatures.update((resume_id, bytes(signature)) for resume_id, signature in cursor.fetchall())
+            conn.commit()
+
+    clusters = _DisjointSet()
+    verified = set()
+    for bucket in buckets:
+        bucket = [resume_id for resume_id in bucket if resume_id in signatures]
+        for index, resume_id in enumerate(bucket[:-1]):
+            # Pairs already compared in another band, or already in one cluster, are skipped
+            others = [
+                other for other in bucket[index + 1:]
+                if (resume_id, other) not in verified and clusters.find(resume_id) != clusters.find(other)
+            ]
+            if not others:
+                continue
+            verified.update((resume_id, other) for other in others)
+            scores = similarities(_decode(signatures[resume_id]), [signatures[other] for other in others])
+            for other, score in zip(others, scores):
+                if score >= threshold:
+                    clusters.union(resume_id, other)
+
+    cluster_ids = {resume_id: clusters.find(resume_id) for resume_id in list(clusters.parent)}
+    sizes = {}
+    for cluster_id in cluster_ids.values():
+        sizes[cluster_id] = sizes.get(cluster_id, 0) + 1
+    rows = [(resume_id, cluster_id) for resume_id, cluster_id in cluster_ids.items() if sizes[cluster_id] > 1]
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("UPDATE resume_signatures SET cluster_id = NULL WHERE cluster_id IS NOT NULL")
+            if rows:
+                execute_values(cursor, """
+                    UPDATE resume_signatures s SET cluster_id = v.cluster_id
+                    FROM (VALUES %s) AS v(resume_id, cluster_id)
+                    WHERE s.resume_id = v.resume_id
+                """, rows, template="(%s::integer, %s::integer)", page_size=batch_size)
+            conn.commit()
+
+    return {
+        "signatures_backfilled": backfilled,
+        "buckets": len(buckets),
+        "oversized_buckets": oversized,
+        "pairs_compared": len(verified),
+        "clusters": sum(1 for size in sizes.values() if size > 1),
+        "resumes_in_clusters": len(rows),
+        "took_seconds": round(time.monotonic() - started, 2),
+    }
+
+
+@dedup_router.get("/resumes/duplicate-clusters")
+def get_duplicate_clusters(
+    limit: int = Query(20, ge=1, le=100),
+    after: Optional[int] = Query(None, description="cluster_id of the last cluster on the previous page"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Near-duplicate groups found by the last clustering run (`python dedup_job.py`)
+
+    Clusters are identified by their smallest resume id and listed in that order.
+    """
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT s.cluster_id,
+                           count(*) AS size,
+                           array_agg(s.resume_id ORDER BY s.resume_id) AS resume_ids,
+                           array_agg(DISTINCT r.full_name) FILTER (WHERE r.full_name IS NOT NULL) AS full_names
+                    FROM resume_signatures s
+                    JOIN resumes r ON r.id = s.resume_id
+                    WHERE s.cluster_id IS NOT NULL AND s.cluster_id > %s
+                    GROUP BY s.cluster_id
+                    ORDER BY s.cluster_id
+                    LIMIT %s
+                """, (after or 0, limit))
+                clusters = cursor.fetchall()
+                conn.commit()
+        return {
+            "clusters": clusters,
+            "limit": limit,
+            "next_after": clusters[-1]['cluster_id'] if len(clusters) == limit else None
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching duplicate clusters: {str(e)}")
+
+
+@dedup_router.get("/resumes/{resume_id}/duplicates")
+def get_resume_duplicates(
+    resume_id: int,
+    threshold: float = Query(DEDUP_THRESHOLD, gt=0, le=1),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Near-duplicates of a resume (edited copies of the same CV), most similar first
+
+    - **threshold**: minimum estimated Jaccard similarity of the word shingles of `raw_text`
+    - **cluster_id**: the resume's group from the last clustering run, if any
+    """
+    try:
+        return find_duplicates(resume_id, threshold, limit)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error finding duplicates: {str(e)}")
+
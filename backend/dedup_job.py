@@ -0,0 +1,22 @@
+import logging
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from database import init_db_pool, close_db_pool
+from dedup import cluster_duplicates
+
+logger = logging.getLogger(__name__)
+
+def main():
+    """Group near-duplicate resumes; run periodically, e.g. nightly from cron"""
+    init_db_pool()
+    try:
+        logger.info("Duplicate clustering finished: %s", cluster_duplicates())
+    finally:
+        close_db_pool()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
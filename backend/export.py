@@ -0,0 +1,284 @@
+import asyncio
+import io
+import os
+import threading
+import uuid
+import anyio
+from fastapi import HTTPException
+import psycopg2
+import pyarrow as pa
+import pyarrow.parquet as pq
+from database import get_db_pool, run_db, PoolTimeout
+
+# Configuration
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", str(256 * 1024)))  # 256KB
+EXPORT_PARQUET_ROW_GROUP_SIZE = int(os.getenv("EXPORT_PARQUET_ROW_GROUP_SIZE", "50000"))
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+PARQUET_TYPES = {
+    "id": "int64",
+    "user_id": "int64",
+    "experience_years": "int32",
+    "skills": "list<string>",
+    "uploaded_at": "timestamp",
+    "created_at": "timestamp",
+    "updated_at": "timestamp",
+}
+
+
+def _borrow_connection():
+    try:
+        return get_db_pool().acquire()
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=f"Database busy: {str(e)}")
+
+
+class CopyExport:
+    """
+    CSV or NDJSON rendered by Postgres with ``COPY ... TO STDOUT``
+
+    COPY runs on its own thread and hands chunks of about ``chunk_size``
+    bytes to the response through a small bounded queue, so a slow client
+    pauses the COPY instead of letting output pile up in memory. The thread
+    borrows the connection only once the response starts streaming and
+    returns it when the COPY ends.
+    """
+
+    def __init__(self, format: str, columns: list, where: str, params: list, chunk_size: int = EXPORT_CHUNK_SIZE):
+        self.format = format
+        self.columns = columns
+        self.where = where
+        self.params = params
+        self.chunk_size = chunk_size
+        self._conn = None
+        self._copy_sql = None
+        self._queue = None
+        self._loop = None
+        self._cancelled = False
+        self._pending = []
+        self._pending_size = 0
+
+    def _select(self) -> str:
+        if self.format == "csv":
+            # Arrays as "a; b; c" rather than Postgres array literals
+            columns = [
+                f"array_to_string({column}, '; ') AS {column}" if column in ("skills", "skill_keys") else column
+                for column in self.columns
+            ]
+        else:
+            columns = self.columns
+        return f"SELECT {', '.join(columns)} FROM resumes {self.where} ORDER BY id"
+
+    def _open(self) -> None:
+        """Borrow a connection and render the COPY statement (blocking)"""
+        self._conn = _borrow_connection()
+        try:
+            with self._conn.cursor() as cursor:
+                query = cursor.mogrify(self._select(), self.params).decode()
+        except psycopg2.Error as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        if self.format == "csv":
+            self._copy_sql = f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+        else:
+            # One JSON document per line. CSV mode with control characters as quote and
+            # delimiter copies the JSON text unescaped (JSON escapes those characters itself)
+            self._copy_sql = (
+                f"COPY (SELECT row_to_json(t) FROM ({query}) t) TO STDOUT "
+                f"WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+            )
+
+    def write(self, data: bytes) -> int:
+        """File interface for copy_expert, called with one row at a time"""
+        if self._cancelled:
+            raise IOError("Export cancelled")
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= self.chunk_size:
+            self._put(b"".join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+        return len(data)
+
+    def _put(self, item) -> None:
+        # Blocks the COPY thread while the queue is full
+        asyncio.run_coroutine_threadsafe(self._queue.put(item), self._loop).result()
+
+    def _run_copy(self) -> None:
+        try:
+            self._open()
+        except Exception as e:
+            self._release()
+            self._put(e)
+            return
+        try:
+            with self._conn.cursor() as cursor:
+                cursor.copy_expert(self._copy_sql, self)
+            if self._pending:
+                self._put(b"".join(self._pending))
+            self._put(None)
+        except Exception as e:
+            if not self._cancelled:
+                self._put(e)
+            # A COPY interrupted half way leaves the connection unusable
+            self._conn.close()
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        if self._conn is not None:
+            get_db_pool().release(self._conn)
+            self._conn = None
+
+    async def stream(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=4)
+        threading.Thread(target=self._run_copy, name="export-copy", daemon=True).start()
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Unblock the COPY thread if the client went away; it aborts on its next write
+            self._cancelled = True
+            while not self._queue.empty():
+                self._queue.get_nowait()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file for pyarrow that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ParquetExport:
+    """
+    Parquet read through a server-side (named) cursor, one row group at a time
+
+    The cursor fetches ``batch_size`` rows per round trip; at most one row
+    group (``row_group_size`` rows) is buffered before it is written and sent
+    to the client. The connection is borrowed once the response starts
+    streaming and returned when it ends, however it ends.
+    """
+
+    def __init__(
+        self,
+        columns: list,
+        where: str,
+        params: list,
+        batch_size: int = EXPORT_BATCH_SIZE,
+        row_group_size: int = EXPORT_PARQUET_ROW_GROUP_SIZE,
+    ):
+        types = {
+            "int64": pa.int64(),
+            "int32": pa.int32(),
+            "list<string>": pa.list_(pa.string()),
+            "timestamp": pa.timestamp("us"),
+        }
+        self.columns = columns
+        self.query = f"SELECT {', '.join(columns)} FROM resumes {where} ORDER BY id"
+        self.params = params
+        self.batch_size = batch_size
+        self.row_group_size = row_group_size
+        self._schema = pa.schema([
+            (column, types.get(PARQUET_TYPES.get(column), pa.string())) for column in columns
+        ])
+        self._conn = None
+        self._cursor = None
+        self._sink = None
+        self._writer = None
+        self._pending = []
+
+    def _open(self) -> None:
+        """Borrow a connection and declare the cursor (blocking)"""
+        self._conn = _borrow_connection()
+        try:
+            self._cursor = self._conn.cursor(name=f"export_{uuid.uuid4().hex}")
+            self._cursor.itersize = self.batch_size
+            self._cursor.execute(self.query, self.params)
+        except psycopg2.Error as e:
+            self.close()
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        self._sink = _ChunkSink()
+        self._writer = pq.ParquetWriter(self._sink, self._schema, compression="snappy")
+
+    def _write_row_group(self) -> None:
+        table = pa.Table.from_pylist(
+            [dict(zip(self.columns, row)) for row in self._pending], schema=self._schema
+        )
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self._pending = []
+
+    def _next_chunk(self):
+        """Fetch rows until a row group is complete; None once the file is finished"""
+        if self._writer is None:
+            return None
+        while len(self._pending) < self.row_group_size:
+            rows = self._cursor.fetchmany(self.batch_size)
+            if not rows:
+                if self._pending:
+                    self._write_row_group()
+                self._writer.close()
+                self._writer = None
+                return self._sink.drain()
+            self._pending.extend(rows)
+        self._write_row_group()
+        return self._sink.drain()
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            if self._cursor is not None and not self._cursor.closed:
+                self._cursor.close()
+        except psycopg2.Error:
+            pass
+        get_db_pool().release(self._conn)
+        self._conn = None
+
+    async def stream(self):
+        try:
+            await run_db(self._open)
+            while True:
+                chunk = await run_db(self._next_chunk)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            # Shielded: a client disconnect cancels the stream, but the connection must go back
+            with anyio.CancelScope(shield=True):
+                await run_db(self.close)
+
+
+def create_export(format: str, columns: list, where: str, params: list):
+    """Export for one of EXPORT_MEDIA_TYPES; nothing is borrowed until ``stream()`` is iterated"""
+    if format == "parquet":
+        return ParquetExport(columns, where, params)
+    return CopyExport(format, columns, where, params)
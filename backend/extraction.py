@@ -0,0 +1,175 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+# Configuration
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "30"))
+EXTRACTION_MAX_PAGES = int(os.getenv("EXTRACTION_MAX_PAGES", "50"))
+
+
+class ExtractionResult(NamedTuple):
+    """Text pulled out of a PDF"""
+    text: str
+    pages: int
+    pages_extracted: int
+    truncated: bool
+
+
+class ExtractionTimeout(Exception):
+    """Raised when a PDF takes longer than EXTRACTION_TIMEOUT to extract"""
+
+
+def _init_worker() -> None:
+    # Import the parser once per process rather than once per file
+    import pypdf  # noqa: F401
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+def extract_pdf_text(file_path: str, max_pages: int = EXTRACTION_MAX_PAGES) -> ExtractionResult:
+    """Extract text from the first ``max_pages`` pages of a PDF (runs in a worker process)"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    total_pages = len(reader.pages)
+    pages_to_read = min(total_pages, max_pages) if max_pages > 0 else total_pages
+
+    parts = []
+    for index in range(pages_to_read):
+        page_text = reader.pages[index].extract_text() or ""
+        if page_text:
+            parts.append(page_text)
+
+    return ExtractionResult(
+        text="\n".join(parts).replace("\x00", ""),
+        pages=total_pages,
+        pages_extracted=pages_to_read,
+        truncated=pages_to_read < total_pages,
+    )
+
+
+class TextExtractor:
+    """
+    Warm pool of worker processes that run ``extract_pdf_text``.
+
+    PDF parsing is CPU bound, so it runs outside the event loop and outside
+    the GIL. A running task cannot be cancelled in a ProcessPoolExecutor, so
+    on timeout the whole pool is recycled; other in-flight extractions then
+    fail and their analysis jobs are retried by the queue.
+    """
+
+    def __init__(
+        self,
+        workers: int = EXTRACTION_WORKERS,
+        timeout: float = EXTRACTION_TIMEOUT,
+        max_pages: int = EXTRACTION_MAX_PAGES,
+    ):
+        self.workers = max(workers, 1)
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn: never fork a process that holds pooled database sockets
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def start(self) -> None:
+        """Start the worker processes and wait until they are ready"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+            executor = self._executor
+        for future in [executor.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+
+    def close(self) -> None:
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _recycle(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = self._create_executor()
+        for process in list(getattr(executor, "_processes", {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def extract(self, file_path: str) -> ExtractionResult:
+        """Extract a PDF's text in the process pool"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+            executor = self._executor
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(executor, extract_pdf_text, file_path, self.max_pages)
+        try:
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._recycle(executor)
+            raise ExtractionTimeout(f"Text extraction exceeded {self.timeout}s for {os.path.basename(file_path)}")
+
+
+_extractor = None
+
+
+def init_extractor() -> TextExtractor:
+    """Create and warm the shared extractor (called from the app lifespan)"""
+    global _extractor
+    if _extractor is None:
+        _extractor = TextExtractor()
+        _extractor.start()
+    return _extractor
+
+
+def close_extractor() -> None:
+    """Stop the shared extractor (called from the app lifespan)"""
+    global _extractor
+    if _extractor is not None:
+        _extractor.close()
+        _extractor = None
+
+
+def get_extractor() -> TextExtractor:
+    """Return the shared extractor, creating it lazily outside the app lifespan"""
+    global _extractor
+    if _extractor is None:
+        _extractor = TextExtractor()
+    return _extractor
+
+
+async def _benchmark(paths):
+    extractor = TextExtractor()
+    extractor.start()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(extractor.extract(path) for path in paths), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    extractor.close()
+
+    failed = sum(1 for result in results if isinstance(result, Exception))
+    files_per_sec = len(paths) / elapsed if elapsed else 0.0
+    print(f"{len(paths)} files ({failed} failed) in {elapsed:.2f}s with {extractor.workers} workers")
+    print(f"{files_per_sec:.1f} files/sec, {files_per_sec / extractor.workers:.1f} files/sec per core")
+
+
+if __name__ == "__main__":
+    # Throughput check: python extraction.py resume1.pdf resume2.pdf ...
+    import sys
+
+    asyncio.run(_benchmark(sys.argv[1:]))
@@ -0,0 +1,333 @@
+import os
+import re
+from typing import NamedTuple
+
+# Configuration
+FAST_PATH_CONFIDENCE_THRESHOLD = float(os.getenv("FAST_PATH_CONFIDENCE_THRESHOLD", "0.8"))
+FAST_PATH_REQUIRED_FIELDS = tuple(
+    field.strip()
+    for field in os.getenv(
+        "FAST_PATH_REQUIRED_FIELDS", "full_name,email,phone,skills,experience_years,last_job_title"
+    ).split(",")
+    if field.strip()
+)
+
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+PHONE_RE = re.compile(r"(?<![\w+])\+?\(?\d[\d\s().-]{7,}\d(?!\w)")
+EXPERIENCE_RE = re.compile(
+    r"(\d{1,2})\+?\s*(?:years|yrs)\.?(?:\s+of)?\s+(?:[a-z]+\s+){0,2}experience",
+    re.IGNORECASE,
+)
+SKILLS_HEADING_RE = re.compile(r"^\s*(?:technical\s+|core\s+|key\s+)?skills\b", re.IGNORECASE | re.MULTILINE)
+TOKEN_RE = re.compile(r"[a-z0-9.+#/-]+")
+NAME_WORD_RE = re.compile(r"^[A-Z][A-Za-z'\-]*\.?$")
+EXPERIENCE_HEADING_RE = re.compile(
+    r"^\s*(?:professional\s+|work\s+|employment\s+)?(?:experience|history)\s*:?\s*$", re.IGNORECASE
+)
+# Splits "Senior Engineer at Acme | 2019 - Present" into the title and the rest
+TITLE_SEPARATOR_RE = re.compile(r"\s+(?:at|@)\s+|\s*[|,\u2013\u2014(]\s*|\s+-\s+|\s{2,}|\t")
+TITLE_NOUNS = {
+    "engineer", "developer", "programmer", "architect", "scientist", "analyst", "designer",
+    "manager", "director", "consultant", "administrator", "specialist", "lead", "intern",
+    "officer", "coordinator", "accountant", "technician", "tester", "researcher", "head",
+}
+NAME_STOPWORDS = {"resume", "curriculum", "vitae", "cv", "profile", "contact", "summary", "page"}
+
+# Canonical skill name -> lower-case aliases. The canonical name is matched too,
+# except for skills in ALIAS_ONLY_SKILLS whose names are also common words.
+SKILL_VOCABULARY = {
+    "Python": ["python3"],
+    "Java": [],
+    "JavaScript": ["js", "ecmascript"],
+    "TypeScript": [],
+    "C++": ["cpp"],
+    "C#": ["csharp"],
+    "Go": ["golang"],
+    "Rust": [],
+    "Ruby": [],
+    "PHP": [],
+    "Kotlin": [],
+    "Swift": [],
+    "Scala": [],
+    "SQL": [],
+    "Bash": ["shell scripting"],
+    "HTML": ["html5"],
+    "CSS": ["css3"],
+    "React": ["react.js", "reactjs"],
+    "Angular": ["angular.js", "angularjs"],
+    "Vue.js": ["vue", "vuejs"],
+    "Node.js": ["nodejs"],
+    "Next.js": ["nextjs"],
+    "Express": ["express.js", "expressjs"],
+    "Django": [],
+    "Flask": [],
+    "FastAPI": [],
+    "Spring Boot": [],
+    "Ruby on Rails": ["rails"],
+    ".NET": ["dotnet", "asp.net"],
+    "GraphQL": [],
+    "REST APIs": ["restful", "rest api", "restful apis"],
+    "gRPC": [],
+    "PostgreSQL": ["postgres"],
+    "MySQL": [],
+    "SQLite": [],
+    "MongoDB": ["mongo"],
+    "Redis": [],
+    "Elasticsearch": ["elastic search"],
+    "Cassandra": [],
+    "DynamoDB": [],
+    "Oracle": [],
+    "Kafka": ["apache kafka"],
+    "RabbitMQ": [],
+    "Spark": ["apache spark", "pyspark"],
+    "Hadoop": [],
+    "Airflow": ["apache airflow"],
+    "dbt": [],
+    "Snowflake": [],
+    "Tableau": [],
+    "Power BI": ["powerbi"],
+    "Excel": ["microsoft excel"],
+    "Pandas": [],
+    "NumPy": [],
+    "scikit-learn": ["sklearn", "scikit learn"],
+    "TensorFlow": [],
+    "PyTorch": [],
+    "Keras": [],
+    "Machine Learning": ["ml"],
+    "Deep Learning": [],
+    "Natural Language Processing": ["nlp"],
+    "Computer Vision": [],
+    "Data Analysis": [],
+    "Statistics": [],
+    "AWS": ["amazon web services"],
+    "Azure": ["microsoft azure"],
+    "GCP": ["google cloud", "google cloud platform"],
+    "Docker": [],
+    "Kubernetes": ["k8s"],
+    "Terraform": [],
+    "Ansible": [],
+    "Jenkins": [],
+    "GitHub Actions": [],
+    "GitLab CI": [],
+    "CI/CD": ["ci cd", "continuous integration"],
+    "Git": [],
+    "Linux": [],
+    "Nginx": [],
+    "Microservices": [],
+    "Agile": [],
+    "Scrum": [],
+    "Jira": [],
+    "Figma": [],
+    "Selenium": [],
+    "Pytest": [],
+    "Jest": [],
+    "Project Management": [],
+    "Leadership": [],
+    "Communication": [],
+}
+ALIAS_ONLY_SKILLS = {"Go", "Express"}
+
+
+class FieldValue(NamedTuple):
+    """An extracted field and how sure the extractor is about it (0..1)"""
+    value: object
+    confidence: float
+
+
+def _tokenize(text: str) -> list:
+    return [token.rstrip(".,;:/-") for token in TOKEN_RE.findall(text.lower())]
+
+
+def _build_skill_trie(vocabulary: dict) -> dict:
+    """Token trie: each node maps the next token to a child; None holds the canonical skill"""
+    trie = {}
+    for canonical, aliases in vocabulary.items():
+        phrases = aliases if canonical in ALIAS_ONLY_SKILLS else [canonical.lower(), *aliases]
+        for phrase in phrases:
+            node = trie
+            for token in _tokenize(phrase):
+                node = node.setdefault(token, {})
+            node[None] = canonical
+    return trie
+
+
+SKILL_TRIE = _build_skill_trie(SKILL_VOCABULARY)
+SKILL_ALIASES = {
+    alias: canonical
+    for canonical, aliases in SKILL_VOCABULARY.items()
+    for alias in [canonical.lower(), *aliases]
+}
+
+
+def skill_key(skill: str) -> str:
+    """Lower-case search key for a skill, with known aliases mapped to one key"""
+    cleaned = " ".join(str(skill).split()).lower()
+    return SKILL_ALIASES.get(cleaned, cleaned).lower()
+
+
+def normalize_skills(skills) -> tuple:
+    """
+    Clean a skill list for storage; returns (skills, skill_keys)
+
+    Whitespace is collapsed, known aliases become their canonical name
+    ("k8s" -> "Kubernetes"), and duplicates are dropped case-insensitively.
+    ``skill_keys`` holds the matching lower-case keys used for search.
+    """
+    display, keys = [], []
+    for skill in skills or []:
+        cleaned = " ".join(str(skill).split())
+        if not cleaned:
+            continue
+        key = skill_key(cleaned)
+        if key in keys:
+            continue
+        keys.append(key)
+        display.append(SKILL_ALIASES.get(cleaned.lower(), cleaned))
+    return display, keys
+
+
+def match_skills(text: str) -> list:
+    """Find vocabulary skills in one left-to-right pass, preferring the longest phrase"""
+    tokens = _tokenize(text)
+    found = {}
+    i = 0
+    while i < len(tokens):
+        node = SKILL_TRIE
+        match, match_end = None, i
+        j = i
+        while j < len(tokens) and tokens[j] in node:
+            node = node[tokens[j]]
+            j += 1
+            if None in node:
+                match, match_end = node[None], j
+        if match:
+            found.setdefault(match, None)
+            i = match_end
+        else:
+            i += 1
+    return list(found)
+
+
+def _extract_email(text: str) -> FieldValue:
+    emails = list(dict.fromkeys(email.lower() for email in EMAIL_RE.findall(text)))
+    if not emails:
+        return FieldValue(None, 0.0)
+    return FieldValue(emails[0], 0.99 if len(emails) == 1 else 0.85)
+
+
+def _extract_phone(text: str) -> FieldValue:
+    phones = []
+    for match in PHONE_RE.findall(text):
+        digits = re.sub(r"\D", "", match)
+        if 10 <= len(digits) <= 15 and match.strip() not in phones:
+            phones.append(match.strip())
+    if not phones:
+        return FieldValue(None, 0.0)
+    return FieldValue(phones[0], 0.95 if len(phones) == 1 else 0.8)
+
+
+def _extract_full_name(text: str, email: str = None) -> FieldValue:
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    for position, line in enumerate(lines[:5]):
+        words = line.split()
+        if not 2 <= len(words) <= 4:
+            continue
+        if any(word.lower().strip(".") in NAME_STOPWORDS for word in words):
+            continue
+        if not all(NAME_WORD_RE.match(word) for word in words):
+            continue
+
+        name = " ".join(word.capitalize() if word.isupper() else word for word in words)
+        confidence = 0.85 if position == 0 else 0.7
+        if email:
+            local_part = re.sub(r"[^a-z]", "", email.split("@")[0])
+            if any(word.lower().strip(".'-") in local_part for word in words if len(word) > 2):
+                confidence = 0.95
+        return FieldValue(name, confidence)
+    return FieldValue(None, 0.0)
+
+
+def _extract_skills(text: str) -> FieldValue:
+    skills = match_skills(text)
+    if not skills:
+        return FieldValue([], 0.0)
+    confidence = 0.7 * min(len(skills), 5) / 5
+    if SKILLS_HEADING_RE.search(text):
+        confidence += 0.25
+    return FieldValue(skills, round(confidence, 2))
+
+
+def _extract_experience_years(text: str) -> FieldValue:
+    years = [int(value) for value in EXPERIENCE_RE.findall(text)]
+    if not years:
+        return FieldValue(None, 0.0)
+    return FieldValue(max(years), 0.85 if len(set(years)) == 1 else 0.6)
+
+
+def _extract_last_job_title(text: str) -> FieldValue:
+    """
+    The first role listed under an experience heading
+
+    Titles are free-form, so only a short line naming a recognised role
+    right below the heading is trusted; anything else is left to the LLM.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    for position, line in enumerate(lines):
+        if not EXPERIENCE_HEADING_RE.match(line):
+            continue
+        for offset, candidate in enumerate(lines[position + 1:position + 3]):
+            title = TITLE_SEPARATOR_RE.split(candidate, maxsplit=1)[0].strip()
+            words = title.split()
+            if not 1 <= len(words) <= 6:
+                continue
+            if words[-1].lower().strip(".") in TITLE_NOUNS:
+                return FieldValue(title, 0.85 if offset == 0 else 0.7)
+        break
+    return FieldValue(None, 0.0)
+
+
+class FieldExtraction:
+    """Per-field values and confidences for one resume"""
+
+    def __init__(self, fields: dict):
+        self.fields = fields
+
+    def confidences(self) -> dict:
+        return {name: field.confidence for name, field in self.fields.items()}
+
+    def analysis_results(self, threshold: float = FAST_PATH_CONFIDENCE_THRESHOLD) -> dict:
+        """
+        Values in the shape analysis_complete_webhook expects
+
+        Fields below ``threshold`` are stored empty (NULL, or no skills) rather
+        than as a guess.
+        """
+        return {
+            name: field.value if field.confidence >= threshold else ([] if name == "skills" else None)
+            for name, field in self.fields.items()
+        }
+
+    def is_confident(
+        self,
+        threshold: float = FAST_PATH_CONFIDENCE_THRESHOLD,
+        required_fields: tuple = FAST_PATH_REQUIRED_FIELDS,
+    ) -> bool:
+        """True when every required field meets the threshold, so the LLM can be skipped"""
+        return all(
+            name in self.fields and self.fields[name].confidence >= threshold
+            for name in required_fields
+        )
+
+
+def extract_fields(text: str) -> FieldExtraction:
+    """Pull contact details, skills and experience out of resume text without an LLM"""
+    text = text or ""
+    email = _extract_email(text)
+    return FieldExtraction({
+        "full_name": _extract_full_name(text, email.value),
+        "email": email,
+        "phone": _extract_phone(text),
+        "skills": _extract_skills(text),
+        "experience_years": _extract_experience_years(text),
+        "last_job_title": _extract_last_job_title(text),
+    })
@@ -0,0 +1,455 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from psycopg2.extras import RealDictCursor, execute_values
+from database import get_db_connection, run_db
+from metrics import ANALYSIS_JOBS_IN_PROGRESS
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+ANALYSIS_WORKER_CONCURRENCY = int(os.getenv("ANALYSIS_WORKER_CONCURRENCY", "4"))
+ANALYSIS_JOB_VISIBILITY_TIMEOUT = float(os.getenv("ANALYSIS_JOB_VISIBILITY_TIMEOUT", "0"))  # 0 derives it from the handler
+ANALYSIS_JOB_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_JOB_MAX_ATTEMPTS", "5"))
+ANALYSIS_JOB_RETRY_BASE_DELAY = float(os.getenv("ANALYSIS_JOB_RETRY_BASE_DELAY", "5"))
+ANALYSIS_JOB_RETRY_MAX_DELAY = float(os.getenv("ANALYSIS_JOB_RETRY_MAX_DELAY", "300"))
+ANALYSIS_JOB_POLL_INTERVAL = float(os.getenv("ANALYSIS_JOB_POLL_INTERVAL", "1"))
+ANALYSIS_JOB_RETENTION_DAYS = float(os.getenv("ANALYSIS_JOB_RETENTION_DAYS", "7"))  # 0 keeps finished jobs forever
+ANALYSIS_JOB_PURGE_INTERVAL = float(os.getenv("ANALYSIS_JOB_PURGE_INTERVAL", "3600"))
+ANALYSIS_JOB_PURGE_BATCH = int(os.getenv("ANALYSIS_JOB_PURGE_BATCH", "1000"))
+ANALYSIS_QUEUE_STATS_TTL = float(os.getenv("ANALYSIS_QUEUE_STATS_TTL", "5"))
+
+# Seconds of lease kept on top of a handler's worst-case duration, for its database writes
+LEASE_MARGIN = 30.0
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_DEAD = "dead"
+
+
+class JobDeferred(Exception):
+    """
+    Raised by a handler to put the job back without using up an attempt
+
+    For outages of a downstream service: the resume stays ``pending`` and the
+    job runs again after ``delay`` seconds.
+    """
+
+    def __init__(self, delay: float, reason: str):
+        super().__init__(reason)
+        self.delay = delay
+        self.reason = reason
+
+
+def enqueue_job(cursor, resume_id: int, file_path: str, filename: str) -> int:
+    """Insert an analysis job using the caller's cursor, so it commits with the resume row"""
+    cursor.execute("""
+        INSERT INTO analysis_jobs (resume_id, file_path, filename, max_attempts)
+        VALUES (%s, %s, %s, %s)
+        RETURNING id
+    """, (resume_id, file_path, filename, ANALYSIS_JOB_MAX_ATTEMPTS))
+    row = cursor.fetchone()
+    return row['id'] if isinstance(row, dict) else row[0]
+
+
+def enqueue_jobs(cursor, jobs: list) -> list:
+    """Insert several jobs in one statement; ``jobs`` holds (resume_id, file_path, filename) tuples"""
+    if not jobs:
+        return []
+    rows = execute_values(cursor, """
+        INSERT INTO analysis_jobs (resume_id, file_path, filename, max_attempts)
+        VALUES %s
+        RETURNING id
+    """, [(*job, ANALYSIS_JOB_MAX_ATTEMPTS) for job in jobs], page_size=len(jobs), fetch=True)
+    return [row['id'] if isinstance(row, dict) else row[0] for row in rows]
+
+
+def claim_job(visibility_timeout: float = ANALYSIS_JOB_VISIBILITY_TIMEOUT):
+    """
+    Lease the next runnable job, or return None.
+
+    A job is runnable when it is queued and due, or when a previous worker's
+    lease expired without finishing it. SKIP LOCKED lets any number of workers
+    poll the same table without blocking on each other.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("""
+                WITH next_job AS (
+                    SELECT id FROM analysis_jobs
+                    WHERE (status = %s AND run_after <= NOW())
+                       OR (status = %s AND locked_until < NOW())
+                    ORDER BY run_after, id
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                UPDATE analysis_jobs j SET
+                    status = %s,
+                    attempts = j.attempts + 1,
+                    locked_until = NOW() + make_interval(secs => %s),
+                    updated_at = NOW()
+                FROM next_job
+                WHERE j.id = next_job.id
+                RETURNING j.*
+            """, (JOB_QUEUED, JOB_RUNNING, JOB_RUNNING, visibility_timeout))
+            job = cursor.fetchone()
+            if job is not None:
+                cursor.execute(
+                    "UPDATE resumes SET analysis_status = %s, updated_at = NOW() "
+                    "WHERE id = %s AND analysis_status <> 'completed'",
+                    ('processing', job['resume_id'])
+                )
+                job = dict(job)
+                job['resume_completed'] = cursor.rowcount == 0
+            conn.commit()
+            return job
+
+
+# Every update of a leased job matches the lease it was claimed with: a worker whose
+# visibility timeout expired must not finish, fail or reschedule a job that another
+# worker has re-claimed since. ``locked_until`` is set anew by each claim.
+LEASE_HELD = "status = 'running' AND locked_until = %s"
+
+
+def complete_job(job: dict) -> bool:
+    """Mark a job as finished; False when the lease was lost to another worker"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE analysis_jobs SET
+                    status = %s, locked_until = NULL, last_error = NULL, updated_at = NOW()
+                WHERE id = %s AND {LEASE_HELD}
+            """, (JOB_COMPLETED, job['id'], job['locked_until']))
+            held = cursor.rowcount > 0
+            conn.commit()
+    return held
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for the given attempt number"""
+    delay = min(ANALYSIS_JOB_RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0)), ANALYSIS_JOB_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def fail_job(job: dict, error: str) -> str:
+    """
+    Record a failed attempt and return the job's new status.
+
+    The job is re-queued with backoff until it runs out of attempts, then it
+    is dead-lettered and the resume is marked as failed. A resume that was
+    completed meanwhile (n8n stored the results but its reply timed out)
+    keeps its status. Returns None when the lease was lost to another worker.
+    """
+    dead = job['attempts'] >= job['max_attempts']
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            if dead:
+                cursor.execute(f"""
+                    UPDATE analysis_jobs SET
+                        status = %s, locked_until = NULL, last_error = %s, updated_at = NOW()
+                    WHERE id = %s AND {LEASE_HELD}
+                """, (JOB_DEAD, error, job['id'], job['locked_until']))
+                resume_status = 'failed'
+            else:
+                cursor.execute(f"""
+                    UPDATE analysis_jobs SET
+                        status = %s,
+                        locked_until = NULL,
+                        last_error = %s,
+                        run_after = NOW() + make_interval(secs => %s),
+                        updated_at = NOW()
+                    WHERE id = %s AND {LEASE_HELD}
+                """, (JOB_QUEUED, error, retry_delay(job['attempts']), job['id'], job['locked_until']))
+                resume_status = 'pending'
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return None
+            cursor.execute(
+                "UPDATE resumes SET analysis_status = %s, updated_at = NOW() "
+                "WHERE id = %s AND analysis_status <> 'completed'",
+                (resume_status, job['resume_id'])
+            )
+            conn.commit()
+    return JOB_DEAD if dead else JOB_QUEUED
+
+
+def defer_job(job: dict, delay: float, reason: str) -> bool:
+    """
+    Re-queue a job after ``delay`` seconds and refund the attempt it was leased with
+
+    Returns False when the lease was lost to another worker.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE analysis_jobs SET
+                    status = %s,
+                    attempts = GREATEST(attempts - 1, 0),
+                    locked_until = NULL,
+                    last_error = %s,
+                    run_after = NOW() + make_interval(secs => %s),
+                    updated_at = NOW()
+                WHERE id = %s AND {LEASE_HELD}
+            """, (JOB_QUEUED, reason, delay, job['id'], job['locked_until']))
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return False
+            cursor.execute(
+                "UPDATE resumes SET analysis_status = %s, updated_at = NOW() "
+                "WHERE id = %s AND analysis_status <> 'completed'",
+                ('pending', job['resume_id'])
+            )
+            conn.commit()
+    return True
+
+
+def purge_finished_jobs(
+    retention_days: float = ANALYSIS_JOB_RETENTION_DAYS, batch_size: int = ANALYSIS_JOB_PURGE_BATCH
+) -> int:
+    """
+    Delete completed and dead jobs last updated more than ``retention_days`` ago
+
+    Runs in batches of ``batch_size`` so a large backlog never holds long
+    locks; returns the number of jobs deleted.
+    """
+    purged = 0
+    while True:
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    DELETE FROM analysis_jobs
+                    WHERE id IN (
+                        SELECT id FROM analysis_jobs
+                        WHERE status IN (%s, %s)
+                          AND updated_at < NOW() - make_interval(secs => %s)
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                """, (JOB_COMPLETED, JOB_DEAD, retention_days * 86400, batch_size))
+                deleted = cursor.rowcount
+                conn.commit()
+        purged += deleted
+        if deleted < batch_size:
+            return purged
+
+
+_queue_stats_lock = threading.Lock()
+_queue_stats = (0.0, None)  # (expires_at, counts)
+
+
+def queue_stats(ttl: float = ANALYSIS_QUEUE_STATS_TTL) -> dict:
+    """
+    Number of jobs in each state, cached for ``ttl`` seconds
+
+    Each state is counted through its partial index, so a probe never scans
+    the whole table.
+    """
+    global _queue_stats
+    with _queue_stats_lock:
+        expires_at, counts = _queue_stats
+        if counts is not None and time.monotonic() < expires_at:
+            return counts
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM analysis_jobs WHERE status = %s),
+                    (SELECT COUNT(*) FROM analysis_jobs WHERE status = %s),
+                    (SELECT COUNT(*) FROM analysis_jobs WHERE status = %s),
+                    (SELECT COUNT(*) FROM analysis_jobs WHERE status = %s)
+            """, (JOB_QUEUED, JOB_RUNNING, JOB_COMPLETED, JOB_DEAD))
+            states = (JOB_QUEUED, JOB_RUNNING, JOB_COMPLETED, JOB_DEAD)
+            counts = {job_status: count for job_status, count in zip(states, cursor.fetchone()) if count}
+            conn.commit()
+
+    with _queue_stats_lock:
+        _queue_stats = (time.monotonic() + ttl, counts)
+    return counts
+
+
+def queue_backlog(window: float = 60.0) -> tuple:
+    """Jobs waiting or running, and jobs completed per second over the last ``window`` seconds"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM analysis_jobs WHERE status = %s)
+                    + (SELECT COUNT(*) FROM analysis_jobs WHERE status = %s),
+                    (SELECT COUNT(*) FROM analysis_jobs
+                     WHERE status = %s AND updated_at > NOW() - make_interval(secs => %s))
+            """, (JOB_QUEUED, JOB_RUNNING, JOB_COMPLETED, window))
+            backlog, completed = cursor.fetchone()
+            return backlog, completed / window
+
+
+class AnalysisWorkerPool:
+    """
+    Fixed number of asyncio workers that lease jobs from ``analysis_jobs``.
+
+    ``handler`` is an async callable that receives the leased job row; if it
+    raises, the attempt is recorded as failed and retried with backoff
+    (``JobDeferred`` re-queues it without counting the attempt). A
+    handler that outlives the visibility timeout is cancelled, since another
+    worker may already have reclaimed the job; ``handler_budget`` (the
+    handler's worst-case duration) raises the timeout when it is too short.
+    Finished jobs older than ANALYSIS_JOB_RETENTION_DAYS are purged every
+    ANALYSIS_JOB_PURGE_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        handler,
+        concurrency: int = ANALYSIS_WORKER_CONCURRENCY,
+        visibility_timeout: float = ANALYSIS_JOB_VISIBILITY_TIMEOUT,
+        poll_interval: float = ANALYSIS_JOB_POLL_INTERVAL,
+        handler_budget: float = 0.0,
+    ):
+        self.handler = handler
+        self.concurrency = concurrency
+        # The lease must outlast the slowest run of the handler, or another worker re-claims it mid-flight
+        if visibility_timeout < handler_budget + LEASE_MARGIN:
+            if visibility_timeout:
+                logger.warning(
+                    "ANALYSIS_JOB_VISIBILITY_TIMEOUT (%.0fs) is shorter than the handler can take (%.0fs); using %.0fs",
+                    visibility_timeout, handler_budget, handler_budget + LEASE_MARGIN
+                )
+            visibility_timeout = handler_budget + LEASE_MARGIN
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self._tasks = []
+        self._purger = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    def start(self) -> None:
+        """Spawn the worker tasks on the running event loop"""
+        global _active_pool
+        self._stopping = False
+        self._tasks = [
+            asyncio.create_task(self._run_worker(worker_id))
+            for worker_id in range(self.concurrency)
+        ]
+        if self._tasks and ANALYSIS_JOB_RETENTION_DAYS > 0 and ANALYSIS_JOB_PURGE_INTERVAL > 0:
+            self._purger = asyncio.create_task(self._run_purger())
+        _active_pool = self
+
+    async def stop(self, grace_period: float = 10.0) -> None:
+        """Let in-flight jobs finish for up to ``grace_period`` seconds, then cancel"""
+        global _active_pool
+        if _active_pool is self:
+            _active_pool = None
+        self._stopping = True
+        self._wakeup.set()
+        if self._purger is not None:
+            self._purger.cancel()
+            await asyncio.gather(self._purger, return_exceptions=True)
+            self._purger = None
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(self._tasks, timeout=grace_period)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self) -> None:
+        """Tell idle workers that new work is available"""
+        self._wakeup.set()
+
+    async def _wait_for_work(self) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _run_purger(self) -> None:
+        while not self._stopping:
+            try:
+                purged = await run_db(purge_finished_jobs)
+                if purged:
+                    logger.info("Purged %s finished analysis jobs", purged)
+            except Exception as e:
+                logger.warning("Could not purge finished analysis jobs: %s", e)
+            await asyncio.sleep(ANALYSIS_JOB_PURGE_INTERVAL)
+
+    async def _run_worker(self, worker_id: int) -> None:
+        while not self._stopping:
+            try:
+                job = await run_db(claim_job, self.visibility_timeout)
+            except Exception as e:
+                logger.warning("Worker %s could not claim a job: %s", worker_id, e)
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            if job is None:
+                await self._wait_for_work()
+                continue
+
+            with ANALYSIS_JOBS_IN_PROGRESS.track_inprogress():
+                await self._process(job)
+
+    async def _process(self, job: dict) -> None:
+        if job['attempts'] > job['max_attempts']:
+            # The lease expired on the final attempt; nothing left to retry
+            await run_db(fail_job, job, job.get('last_error') or "Visibility timeout expired")
+            return
+        if job.get('resume_completed'):
+            # The results arrived after an earlier attempt gave up waiting for n8n's reply
+            await run_db(complete_job, job)
+            return
+
+        try:
+            await asyncio.wait_for(self.handler(job), timeout=self.visibility_timeout)
+        except JobDeferred as e:
+            # Jitter so deferred jobs do not all come back at the same instant
+            delay = e.delay + random.uniform(0, max(e.delay, 1.0) * 0.2)
+            try:
+                if await run_db(defer_job, job, delay, e.reason):
+                    logger.info("Analysis job %s deferred for %.0fs: %s", job['id'], delay, e.reason)
+                else:
+                    self._lease_lost(job)
+            except Exception as db_error:
+                logger.error("Could not defer job %s: %s", job['id'], db_error)
+            return
+        except Exception as e:
+            error = getattr(e, 'detail', None) or str(e) or e.__class__.__name__
+            try:
+                new_status = await run_db(fail_job, job, str(error))
+                if new_status is None:
+                    self._lease_lost(job)
+                    return
+                logger.warning(
+                    "Analysis job %s for resume %s failed (attempt %s/%s, now %s): %s",
+                    job['id'], job['resume_id'], job['attempts'], job['max_attempts'], new_status, error
+                )
+            except Exception as db_error:
+                # The lease will expire and the job will be picked up again
+                logger.error("Could not record failure of job %s: %s", job['id'], db_error)
+            return
+
+        try:
+            if not await run_db(complete_job, job):
+                self._lease_lost(job)
+        except Exception as e:
+            logger.error("Could not mark job %s as completed: %s", job['id'], e)
+
+    def _lease_lost(self, job: dict) -> None:
+        logger.warning(
+            "Analysis job %s outlived its lease and was re-claimed; its outcome was discarded", job['id']
+        )
+
+
+_active_pool = None
+
+
+def wake_workers() -> None:
+    """Wake the in-process worker pool, if this process runs one"""
+    if _active_pool is not None:
+        _active_pool.wake()
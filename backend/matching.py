@@ -0,0 +1,558 @@
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from collections import deque
+from datetime import timedelta
+from typing import List, Optional
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from psycopg2.extras import RealDictCursor
+import notifications
+from auth import get_current_user
+from database import get_db_connection, run_db
+from field_extractor import skill_key
+from status_events import RESUME_STATUS_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+MATCH_MAX_TOP_K = int(os.getenv("MATCH_MAX_TOP_K", "500"))
+MATCH_INDEX_MAX_STALENESS = float(os.getenv("MATCH_INDEX_MAX_STALENESS", "5"))  # seconds
+MATCH_INDEX_REFRESH_OVERLAP = float(os.getenv("MATCH_INDEX_REFRESH_OVERLAP", "5"))  # seconds re-read per refresh
+MATCH_INDEX_LOAD_BATCH = int(os.getenv("MATCH_INDEX_LOAD_BATCH", "10000"))
+MATCH_EXPERIENCE_FALLOFF = float(os.getenv("MATCH_EXPERIENCE_FALLOFF", "3"))  # years until the fit reaches 0
+
+# A skill found in at least this share of index rows is kept as a bitset instead of a list of rows
+MATCH_DENSE_SKILL_SHARE = float(os.getenv("MATCH_DENSE_SKILL_SHARE", "0.03"))
+
+# Bitset rows are added to the dense matrix this many at a time
+SKILL_BLOCK = 64
+
+# Retired rows are compacted away once they outnumber the live ones and this many
+COMPACT_MIN_RETIRED = 1024
+
+RESUME_DELETED_CHANNEL = "resume_deleted"
+
+TITLE_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+
+# Router
+match_router = APIRouter()
+
+
+def title_tokens(title: str) -> list:
+    return TITLE_TOKEN_RE.findall((title or "").lower())
+
+
+class MatchIndex:
+    """
+    In-memory index of completed resumes for job matching
+
+    Every resume is a row. A skill key is stored as the list of rows that have
+    it until it is found in ``dense_share`` of the rows; from then on it is a
+    packed bitset over all rows (``dense[bitset, row // 8]``). A bitset costs
+    ``capacity / 8`` bytes however common the skill, a row list 4 bytes per
+    resume that has it, so only the few common skills pay for bitsets and a
+    large vocabulary of rare skills costs about as much as its postings. Job
+    titles are interned, with an inverted index from title token to title ids.
+
+    A changed resume is appended as a new row and its old row retired, as is
+    a resume that is no longer completed or was deleted; nothing is removed
+    from a row list or bitset in place. Once retired rows outnumber live ones
+    they are compacted away.
+
+    The index is loaded once and then refreshed incrementally from
+    ``resumes.updated_at``; a refresh re-reads the last ``refresh_overlap``
+    seconds so rows committed by slower transactions are not missed. Deleted
+    resumes arrive on the ``resume_deleted`` channel, and after the LISTEN
+    connection reconnects the next refresh reloads everything, retiring
+    whatever it no longer finds.
+    """
+
+    def __init__(
+        self,
+        max_staleness: float = MATCH_INDEX_MAX_STALENESS,
+        refresh_overlap: float = MATCH_INDEX_REFRESH_OVERLAP,
+        load_batch: int = MATCH_INDEX_LOAD_BATCH,
+        dense_share: float = MATCH_DENSE_SKILL_SHARE,
+    ):
+        self.max_staleness = max_staleness
+        self.refresh_overlap = refresh_overlap
+        self.load_batch = load_batch
+        self.dense_share = dense_share
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._dirty = True
+        self._full_reload = False
+        self._deleted = deque()
+        self._watermark = None
+        self._refreshed_at = 0.0
+        self.refreshes = 0
+        self.rows_applied = 0
+        self.compactions = 0
+
+        capacity = 1024
+        self._size = 0
+        self._retired = 0
+        self._positions = {}
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._updated = np.full(capacity, np.datetime64("NaT"), dtype="datetime64[us]")
+        self._experience = np.full(capacity, np.nan, dtype=np.float32)
+        self._title_ids = np.full(capacity, -1, dtype=np.int32)
+        self._dense = np.zeros((SKILL_BLOCK, capacity // 8), dtype=np.uint8)
+
+        self._skill_ids = {}
+        self._skill_names = []
+        # Per skill id: array of rows with the skill, or None once the skill has a bitset
+        self._postings = []
+        self._posting_entries = 0
+        self._bitsets = {}
+        self._title_ids_by_title = {}
+        self._titles_by_token = {}
+
+    # Loading
+
+    def mark_dirty(self, _payload=None) -> None:
+        """Refresh before the next match (called on resume status notifications and analysis webhooks)"""
+        self._dirty = True
+
+    def forget(self, payload: str) -> None:
+        """Retire a deleted resume on the next refresh (called on resume_deleted notifications)"""
+        try:
+            self._deleted.append(int(payload))
+        except ValueError:
+            logger.warning("Ignoring malformed %s payload: %r", RESUME_DELETED_CHANNEL, payload)
+            return
+        self._dirty = True
+
+    def reload(self, _payload=None) -> None:
+        """Reload everything on the next refresh (called after notifications may have been missed)"""
+        self._full_reload = True
+        self._dirty = True
+
+    def refresh_if_stale(self) -> None:
+        if not self._dirty and time.monotonic() - self._refreshed_at < self.max_staleness:
+            return
+        with self._refresh_lock:
+            # Another thread may have refreshed while this one waited
+            if self._dirty or time.monotonic() - self._refreshed_at >= self.max_staleness:
+                self.refresh()
+
+    def refresh(self) -> None:
+        """Load the whole index, or the rows changed since the last refresh (blocking)"""
+        self._dirty = False
+        full = self._watermark is None or self._full_reload
+        self._full_reload = False
+        started = time.monotonic()
+        seen = []
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT LOCALTIMESTAMP")
+                now = cursor.fetchone()[0]
+            # Server-side cursor: the first load may be every resume in the table
+            with conn.cursor(name="match_index_refresh") as cursor:
+                cursor.itersize = self.load_batch
+                columns = "id, analysis_status, skill_keys, experience_years, last_job_title, updated_at"
+                if full:
+                    cursor.execute(f"SELECT {columns} FROM resumes WHERE analysis_status = 'completed'")
+                else:
+                    cursor.execute(f"SELECT {columns} FROM resumes WHERE updated_at > %s", (self._watermark,))
+                while True:
+                    rows = cursor.fetchmany(self.load_batch)
+                    if not rows:
+                        break
+                    if full:
+                        seen.append(np.array([row[0] for row in rows], dtype=np.int64))
+                    with self._lock:
+                        self._apply(rows)
+            conn.commit()
+        with self._lock:
+            if full and self._size:
+                # Rows the load did not return were deleted or left 'completed' unnoticed
+                live = np.flatnonzero(self._active[:self._size])
+                gone = live[~np.isin(self._ids[live], np.concatenate(seen) if seen else [])]
+                for position in gone:
+                    self._retire(int(position))
+            while self._deleted:
+                self._retire(self._positions.get(self._deleted.popleft()))
+            if self._retired > max(self._size - self._retired, COMPACT_MIN_RETIRED):
+                self._compact()
+        if self._watermark is None:
+            logger.info("Match index loaded %s resumes in %.1fs", len(self._positions), time.monotonic() - started)
+        self._watermark = now - timedelta(seconds=self.refresh_overlap)
+        self._refreshed_at = started
+        self.refreshes += 1
+
+    def _skill_id(self, key: str) -> int:
+        skill = self._skill_ids.get(key)
+        if skill is None:
+            skill = len(self._skill_names)
+            self._skill_ids[key] = skill
+            self._skill_names.append(key)
+            self._postings.append(array("i"))
+        return skill
+
+    def _title_id(self, title: str) -> int:
+        if not title:
+            return -1
+        title = " ".join(title.lower().split())
+        title_id = self._title_ids_by_title.get(title)
+        if title_id is None:
+            title_id = len(self._title_ids_by_title)
+            self._title_ids_by_title[title] = title_id
+            for token in set(title_tokens(title)):
+                self._titles_by_token.setdefault(token, []).append(title_id)
+        return title_id
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        extra = capacity - len(self._ids)
+        self._ids = np.concatenate([self._ids, np.zeros(extra, dtype=np.int64)])
+        self._active = np.concatenate([self._active, np.zeros(extra, dtype=bool)])
+        self._updated = np.concatenate([self._updated, np.full(extra, np.datetime64("NaT"), dtype=self._updated.dtype)])
+        self._experience = np.concatenate([self._experience, np.full(extra, np.nan, dtype=np.float32)])
+        self._title_ids = np.concatenate([self._title_ids, np.full(extra, -1, dtype=np.int32)])
+        # Only the common skills have bitsets, so this copies a few rows, not the vocabulary
+        dense = np.zeros((self._dense.shape[0], capacity // 8), dtype=np.uint8)
+        dense[:, :self._dense.shape[1]] = self._dense
+        self._dense = dense
+
+    def _retire(self, position) -> None:
+        if position is None:
+            return
+        del self._positions[int(self._ids[position])]
+        self._active[position] = False
+        self._retired += 1
+
+    def _apply(self, rows: list) -> None:
+        self._grow(self._size + len(rows))
+        bitsets = []
+        positions = []
+        grown = set()
+        for resume_id, status, keys, experience, title, updated_at in rows:
+            updated_at = np.datetime64(updated_at, "us") if updated_at is not None else np.datetime64("NaT")
+            position = self._positions.get(resume_id)
+            if position is not None:
+                if status == "completed" and self._updated[position] == updated_at:
+                    # Re-read by the refresh overlap and unchanged
+                    continue
+                self._retire(position)
+            if status != "completed":
+                continue
+            position = self._size
+            self._size += 1
+            self._positions[resume_id] = position
+            self._ids[position] = resume_id
+            self._active[position] = True
+            self._updated[position] = updated_at
+            self._experience[position] = np.nan if experience is None else experience
+            self._title_ids[position] = self._title_id(title)
+            for key in dict.fromkeys(keys or ()):
+                skill = self._skill_id(key)
+                bitset = self._bitsets.get(skill)
+                if bitset is None:
+                    self._postings[skill].append(position)
+                    self._posting_entries += 1
+                    grown.add(skill)
+                else:
+                    bitsets.append(bitset)
+                    positions.append(position)
+        if bitsets:
+            # Set every (bitset, resume) bit at once: resumes that share a byte are OR-ed together first
+            positions = np.array(positions, dtype=np.int64)
+            offsets = np.array(bitsets, dtype=np.int64) * self._dense.shape[1] + (positions >> 3)
+            values = (128 >> (positions & 7)).astype(np.uint8)
+            order = np.argsort(offsets, kind="stable")
+            offsets, values = offsets[order], values[order]
+            starts = np.flatnonzero(np.concatenate(([True], offsets[1:] != offsets[:-1])))
+            flat = self._dense.reshape(-1)
+            flat[offsets[starts]] |= np.bitwise_or.reduceat(values, starts)
+        threshold = self.dense_share * len(self._ids)
+        for skill in grown:
+            if len(self._postings[skill]) >= threshold:
+                self._make_bitset(skill)
+        self.rows_applied += len(rows)
+
+    def _make_bitset(self, skill: int) -> None:
+        bitset = len(self._bitsets)
+        if bitset >= self._dense.shape[0]:
+            self._dense = np.vstack([
+                self._dense, np.zeros((SKILL_BLOCK, self._dense.shape[1]), dtype=np.uint8)
+            ])
+        positions = np.frombuffer(self._postings[skill], dtype=np.intc)
+        np.bitwise_or.at(self._dense[bitset], positions >> 3, (128 >> (positions & 7)).astype(np.uint8))
+        self._bitsets[skill] = bitset
+        self._posting_entries -= len(positions)
+        self._postings[skill] = None
+
+    def _compact(self) -> None:
+        """Drop retired rows, keeping the live ones in order"""
+        keep = np.flatnonzero(self._active[:self._size])
+        size = len(keep)
+        moved = np.full(self._size, -1, dtype=np.intc)
+        moved[keep] = np.arange(size, dtype=np.intc)
+        for column, empty in (
+            (self._ids, 0), (self._updated, np.datetime64("NaT")), (self._experience, np.nan), (self._title_ids, -1)
+        ):
+            column[:size] = column[keep]
+            column[size:self._size] = empty
+        self._active[:size] = True
+        self._active[size:self._size] = False
+        for bitset in range(len(self._bitsets)):
+            packed = np.packbits(np.unpackbits(self._dense[bitset], count=self._size)[keep])
+            self._dense[bitset, :len(packed)] = packed
+            self._dense[bitset, len(packed):] = 0
+        for skill, postings in enumerate(self._postings):
+            if postings is not None:
+                rows = moved[np.frombuffer(postings, dtype=np.intc)]
+                self._postings[skill] = array("i", rows[rows >= 0].tobytes())
+        self._posting_entries = sum(len(postings) for postings in self._postings if postings is not None)
+        self._positions = {int(resume_id): position for position, resume_id in enumerate(self._ids[:size])}
+        self._size = size
+        self._retired = 0
+        self.compactions += 1
+
+    # Scoring
+
+    def _add_hits(self, key: str, hits: np.ndarray) -> None:
+        """Add 1 to ``hits`` for every row with skill ``key``"""
+        skill = self._skill_ids.get(key)
+        if skill is None:
+            return
+        bitset = self._bitsets.get(skill)
+        if bitset is None:
+            hits[np.frombuffer(self._postings[skill], dtype=np.intc)] += 1
+        else:
+            hits += np.unpackbits(self._dense[bitset], count=len(hits))
+
+    def _rows_with(self, key: str, rows: np.ndarray) -> np.ndarray:
+        """Whether each of ``rows`` has skill ``key``"""
+        skill = self._skill_ids.get(key)
+        if skill is None:
+            return np.zeros(len(rows), dtype=bool)
+        bitset = self._bitsets.get(skill)
+        if bitset is None:
+            return np.isin(rows, np.frombuffer(self._postings[skill], dtype=np.intc))
+        return (self._dense[bitset, rows >> 3] & (128 >> (rows & 7))) != 0
+
+    def match(self, spec: "JobSpec") -> dict:
+        """Score every active resume against ``spec``; top ``spec.top_k`` positions with their breakdowns"""
+        required = list(dict.fromkeys(skill_key(skill) for skill in spec.required_skills if skill.strip()))
+        nice = [key for key in dict.fromkeys(skill_key(s) for s in spec.nice_to_have_skills if s.strip())
+                if key not in required]
+        keywords = list(dict.fromkeys(token for keyword in spec.title_keywords for token in title_tokens(keyword)))
+        has_experience = spec.min_experience is not None or spec.max_experience is not None
+        weights = spec.weights or MatchWeights()
+        components = {
+            "required": weights.required if required else 0.0,
+            "nice_to_have": weights.nice_to_have if nice else 0.0,
+            "experience": weights.experience if has_experience else 0.0,
+            "title": weights.title if keywords else 0.0,
+        }
+        total_weight = sum(components.values())
+        if not total_weight:
+            raise HTTPException(
+                status_code=400,
+                detail="Job spec needs required_skills, nice_to_have_skills, an experience range or title_keywords"
+            )
+
+        with self._lock:
+            end = self._size
+            parts = {}
+
+            if required:
+                required_hits = np.zeros(end, dtype=np.uint8)
+                for key in required:
+                    self._add_hits(key, required_hits)
+                parts["required"] = np.multiply(required_hits, 1 / len(required), dtype=np.float32)
+
+            if nice:
+                nice_hits = np.zeros(end, dtype=np.uint8)
+                for key in nice:
+                    self._add_hits(key, nice_hits)
+                parts["nice_to_have"] = np.multiply(nice_hits, 1 / len(nice), dtype=np.float32)
+
+            experience = self._experience[:end]
+            if has_experience:
+                # 1 inside the range, falling linearly to 0 over MATCH_EXPERIENCE_FALLOFF years outside it
+                fit = np.ones(end, dtype=np.float32)
+                if spec.min_experience is not None:
+                    np.minimum(fit, (experience - spec.min_experience) / MATCH_EXPERIENCE_FALLOFF + 1, out=fit)
+                if spec.max_experience is not None:
+                    np.minimum(fit, (spec.max_experience - experience) / MATCH_EXPERIENCE_FALLOFF + 1, out=fit)
+                np.clip(fit, 0, 1, out=fit)
+                # Unknown experience (NaN) scores 0
+                parts["experience"] = np.nan_to_num(fit, copy=False)
+
+            title_ids = self._title_ids[:end]
+            if keywords:
+                per_title = np.zeros(len(self._title_ids_by_title) + 1, dtype=np.float32)
+                for token in keywords:
+                    per_title[self._titles_by_token.get(token, [])] += 1
+                # Index -1 (no title) reads the extra, always-zero slot at the end
+                parts["title"] = per_title[title_ids] / len(keywords)
+
+            scores = np.zeros(end, dtype=np.float32)
+            for name, part in parts.items():
+                scores += components[name] * part
+            scores /= total_weight
+
+            eligible = self._active[:end] & (scores > 0)
+            if spec.require_all_required and required:
+                eligible &= required_hits == len(required)
+            matched = int(np.count_nonzero(eligible))
+            scores[~eligible] = -1
+
+            k = min(spec.top_k, matched)
+            if k == 0:
+                candidates = np.zeros(0, dtype=np.int64)
+            elif k < end:
+                candidates = np.argpartition(scores, end - k)[end - k:]
+            else:
+                candidates = np.flatnonzero(scores > 0)
+            # Best score first, newest resume first among equal scores
+            candidates = candidates[np.lexsort((-self._ids[candidates], -scores[candidates]))]
+
+            present = {key: self._rows_with(key, candidates) for key in required + nice}
+            results = []
+            for index, position in enumerate(candidates):
+                title_id = int(title_ids[position])
+                years = float(experience[position])
+                breakdown = {
+                    name: {"weight": components[name], "score": round(float(parts[name][position]), 4)}
+                    for name in parts
+                }
+                if required:
+                    breakdown["required"]["matched"] = [key for key in required if present[key][index]]
+                    breakdown["required"]["missing"] = [key for key in required if not present[key][index]]
+                if nice:
+                    breakdown["nice_to_have"]["matched"] = [key for key in nice if present[key][index]]
+                if has_experience:
+                    breakdown["experience"]["years"] = None if np.isnan(years) else years
+                if keywords:
+                    breakdown["title"]["matched"] = [
+                        token for token in keywords if title_id in self._titles_by_token.get(token, ())
+                    ]
+                results.append({
+                    "resume_id": int(self._ids[position]),
+                    "score": round(float(scores[position]), 4),
+                    "breakdown": breakdown,
+                })
+            candidates_total = int(self._active[:end].sum())
+
+        return {"candidates": candidates_total, "matched": matched, "results": results}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "resumes": len(self._positions),
+                "rows": self._size,
+                "retired_rows": self._retired,
+                "skills": len(self._skill_names),
+                "dense_skills": len(self._bitsets),
+                "titles": len(self._title_ids_by_title),
+                "memory_bytes": int(
+                    self._ids.nbytes + self._active.nbytes + self._updated.nbytes + self._experience.nbytes
+                    + self._title_ids.nbytes + self._dense.nbytes + self._posting_entries * np.dtype(np.intc).itemsize
+                ),
+                "refreshes": self.refreshes,
+                "rows_applied": self.rows_applied,
+                "compactions": self.compactions,
+                "age_seconds": round(time.monotonic() - self._refreshed_at, 1) if self.refreshes else None,
+            }
+
+
+match_index = MatchIndex()
+
+# Completed (or re-queued) resumes reach the index on the next match
+notifications.subscribe(RESUME_STATUS_CHANNEL, match_index.mark_dirty)
+notifications.subscribe(RESUME_DELETED_CHANNEL, match_index.forget)
+notifications.subscribe(notifications.RECONNECTED_CHANNEL, match_index.reload)
+
+
+async def warm_match_index() -> None:
+    """Build the index at startup so the first /match does not wait for it"""
+    try:
+        await run_db(match_index.refresh_if_stale)
+    except Exception as e:
+        # The next /match retries the load
+        logger.warning("Could not load the match index: %s", e)
+
+
+class MatchWeights(BaseModel):
+    required: float = Field(0.5, ge=0)
+    nice_to_have: float = Field(0.2, ge=0)
+    experience: float = Field(0.2, ge=0)
+    title: float = Field(0.1, ge=0)
+
+
+class JobSpec(BaseModel):
+    # Bounded so per-resume hit counts fit in a byte
+    required_skills: List[str] = Field([], max_items=100)
+    nice_to_have_skills: List[str] = Field([], max_items=100)
+    min_experience: Optional[float] = Field(None, ge=0)
+    max_experience: Optional[float] = Field(None, ge=0)
+    title_keywords: List[str] = Field([], max_items=100)
+    require_all_required: bool = False
+    top_k: int = Field(50, ge=1, le=MATCH_MAX_TOP_K)
+    weights: Optional[MatchWeights] = None
+
+
+def resume_summaries(resume_ids: list) -> dict:
+    """Display fields of the matched resumes, by id"""
+    if not resume_ids:
+        return {}
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("""
+                SELECT id, filename, full_name, email, phone, skills, experience_years, last_job_title
+                FROM resumes
+                WHERE id = ANY(%s)
+            """, (resume_ids,))
+            return {row['id']: dict(row) for row in cursor.fetchall()}
+
+
+@match_router.post("/match")
+def match_resumes(spec: JobSpec, current_user: dict = Depends(get_current_user)):
+    """
+    Rank completed resumes against a job spec
+
+    - **required_skills** / **nice_to_have_skills**: scored by the share of them a resume has
+    - **min_experience** / **max_experience**: full marks inside the range, fading out
+      over `MATCH_EXPERIENCE_FALLOFF` years outside it
+    - **title_keywords**: scored by the share found in `last_job_title`
+    - **weights**: relative weight of each part; parts the spec leaves out are ignored
+    - Returns the `top_k` best resumes with a per-part score breakdown
+    """
+    if (spec.min_experience is not None and spec.max_experience is not None
+            and spec.min_experience > spec.max_experience):
+        raise HTTPException(status_code=400, detail="min_experience is greater than max_experience")
+    try:
+        match_index.refresh_if_stale()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error refreshing match index: {str(e)}")
+
+    started = time.perf_counter()
+    ranking = match_index.match(spec)
+    took_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    summaries = resume_summaries([result["resume_id"] for result in ranking["results"]])
+    return {
+        "candidates": ranking["candidates"],
+        "matched": ranking["matched"],
+        "took_ms": took_ms,
+        "results": [
+            {**summaries.get(result["resume_id"], {"id": result["resume_id"]}), **result}
+            for result in ranking["results"]
+        ]
+    }
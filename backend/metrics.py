@@ -0,0 +1,168 @@
+import time
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest, start_http_server
+)
+from prometheus_client.core import GaugeMetricFamily
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+DB_QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Route label for requests that matched no route, so scanners cannot blow up cardinality
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Statement label values; anything else is reported as OTHER
+DB_STATEMENTS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "COPY"}
+
+HTTP_REQUESTS = Counter(
+    "resume_analyzer_http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "resume_analyzer_http_request_duration_seconds",
+    "Time from request start to the last byte of the response (streams included)",
+    ["method", "route"],
+)
+HTTP_REQUEST_SIZE = Histogram(
+    "resume_analyzer_http_request_size_bytes", "Request body size", ["method", "route"], buckets=SIZE_BUCKETS
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "resume_analyzer_http_response_size_bytes", "Response body size as sent (after compression)",
+    ["method", "route"], buckets=SIZE_BUCKETS
+)
+HTTP_IN_PROGRESS = Gauge("resume_analyzer_http_requests_in_progress", "HTTP requests being served", ["method"])
+
+STAGE_DURATION = Histogram(
+    "resume_analyzer_stage_duration_seconds",
+    "Duration of the individual steps of uploads, analysis and authentication",
+    ["stage"],
+)
+
+DB_QUERY_DURATION = Histogram(
+    "resume_analyzer_db_query_duration_seconds", "Statement execution time", ["statement"], buckets=DB_QUERY_BUCKETS
+)
+DB_POOL_WAIT = Histogram(
+    "resume_analyzer_db_pool_wait_seconds", "Time spent waiting for a pooled connection", buckets=DB_QUERY_BUCKETS
+)
+DB_CONNECTIONS_OPENED = Counter(
+    "resume_analyzer_db_connections_opened_total", "Physical database connections opened by the pool"
+)
+
+ANALYSIS_JOBS_IN_PROGRESS = Gauge(
+    "resume_analyzer_analysis_jobs_in_progress", "Analysis jobs being processed by this process"
+)
+ANALYSIS_STATUS_TRANSITIONS = Counter(
+    "resume_analyzer_analysis_status_transitions_total",
+    "analysis_status changes, counted once from the resume_status notifications by one API process",
+    ["from_status", "to_status"],
+)
+
+
+def stage_timer(stage: str):
+    """Context manager that records the duration of one stage"""
+    return STAGE_DURATION.labels(stage).time()
+
+
+def observe_db_query(query, seconds: float) -> None:
+    if isinstance(query, bytes):
+        query = query.decode(errors="replace")
+    statement = query.lstrip().split(None, 1)[0].upper() if isinstance(query, str) and query.strip() else ""
+    DB_QUERY_DURATION.labels(statement if statement in DB_STATEMENTS else "OTHER").observe(seconds)
+
+
+def observe_status_transition(previous_status, status) -> None:
+    ANALYSIS_STATUS_TRANSITIONS.labels(previous_status or "none", status or "none").inc()
+
+
+class StatsCollector:
+    """
+    Exports a component's ``stats()`` dict as gauges, read at scrape time
+
+    Numbers become ``resume_analyzer_<component>_<key>`` and nested dicts
+    extend the name. Anything else (strings, lists, None) is left to
+    ``/health``: a free-form value as a label would make a new series per
+    distinct value.
+    """
+
+    def __init__(self, component: str, stats):
+        self.component = component
+        self.stats = stats
+
+    def describe(self):
+        # Names depend on what the component reports; skip the registry's duplicate check
+        return []
+
+    def collect(self):
+        yield from self._families(f"resume_analyzer_{self.component}", self.stats())
+
+    def _families(self, prefix: str, stats: dict):
+        for key, value in stats.items():
+            name = f"{prefix}_{key}"
+            if isinstance(value, dict):
+                yield from self._families(name, value)
+            elif isinstance(value, (bool, int, float)):
+                yield GaugeMetricFamily(name, f"{self.component} {key}", value=float(value))
+
+
+def register_stats(component: str, stats) -> None:
+    REGISTRY.register(StatsCollector(component, stats))
+
+
+def render_metrics() -> tuple:
+    """Body and content type for the /metrics endpoint"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def serve_metrics(port: int) -> None:
+    """Serve /metrics from a background thread, for processes without the API (the worker)"""
+    start_http_server(port)
+
+
+class MetricsMiddleware:
+    """
+    Per-route request count, latency, request and response size, and
+    requests in progress.
+
+    Routes are labelled with their path template (``/resumes/{resume_id}``),
+    which FastAPI leaves in the scope once it has matched the request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        started = time.perf_counter()
+        status_code = 500
+        request_size = 0
+        response_size = 0
+
+        async def receive_counted():
+            nonlocal request_size
+            message = await receive()
+            if message["type"] == "http.request":
+                request_size += len(message.get("body", b""))
+            return message
+
+        async def send_counted(message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = HTTP_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            in_progress.dec()
+            route = scope.get("route")
+            route = getattr(route, "path", None) or UNMATCHED_ROUTE
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+            HTTP_REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - started)
+            HTTP_REQUEST_SIZE.labels(method, route).observe(request_size)
+            HTTP_RESPONSE_SIZE.labels(method, route).observe(response_size)
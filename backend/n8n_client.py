@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+N8N_CONNECT_TIMEOUT = float(os.getenv("N8N_CONNECT_TIMEOUT", "5"))
+N8N_READ_TIMEOUT = float(os.getenv("N8N_READ_TIMEOUT", "120"))
+N8N_MAX_CONNECTIONS = int(os.getenv("N8N_MAX_CONNECTIONS", "20"))
+N8N_KEEPALIVE_TIMEOUT = float(os.getenv("N8N_KEEPALIVE_TIMEOUT", "30"))
+N8N_MAX_RETRIES = int(os.getenv("N8N_MAX_RETRIES", "2"))
+N8N_RETRY_BASE_DELAY = float(os.getenv("N8N_RETRY_BASE_DELAY", "0.5"))
+N8N_RETRY_MAX_DELAY = float(os.getenv("N8N_RETRY_MAX_DELAY", "5"))
+N8N_BREAKER_FAILURE_THRESHOLD = int(os.getenv("N8N_BREAKER_FAILURE_THRESHOLD", "5"))
+N8N_BREAKER_RESET_TIMEOUT = float(os.getenv("N8N_BREAKER_RESET_TIMEOUT", "30"))
+
+# Breaker states
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised without contacting n8n while the circuit breaker is open"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"n8n circuit breaker is open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class N8nError(Exception):
+    """n8n answered with an error, or could not be reached after all retries"""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` failed calls in a row the circuit opens and
+    calls fail immediately for ``reset_timeout`` seconds. Then a single trial
+    call is let through: success closes the circuit, failure re-opens it.
+    Only used from the event loop, so it needs no locking.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+
+    def retry_after(self) -> float:
+        return max(self.opened_at + self.reset_timeout - time.monotonic(), 0.0)
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now"""
+        if self.state == CIRCUIT_OPEN:
+            if self.retry_after() > 0:
+                raise CircuitOpenError(self.retry_after())
+            self.state = CIRCUIT_HALF_OPEN
+        if self.state == CIRCUIT_HALF_OPEN:
+            if self._trial_in_flight:
+                raise CircuitOpenError(self.reset_timeout)
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        if self.state != CIRCUIT_CLOSED:
+            logger.info("n8n circuit breaker closed")
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def cancel_call(self) -> None:
+        """Give up a half-open trial slot that ended without an outcome"""
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != CIRCUIT_OPEN:
+                logger.warning("n8n circuit breaker opened after %s failures", self.failures)
+                self.times_opened += 1
+            self.state = CIRCUIT_OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "open": self.state == CIRCUIT_OPEN,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "retry_after": round(self.retry_after(), 1) if self.state == CIRCUIT_OPEN else 0,
+        }
+
+
+class N8nClient:
+    """
+    Application-scoped HTTP client for n8n webhooks.
+
+    One keep-alive connection pool is shared by every dispatch. Failures
+    before any of the request body was sent (connection errors, connect
+    timeouts), 429 and 5xx responses are retried with jittered backoff; a
+    call that still fails counts against the circuit breaker. Once the body
+    is out, a timeout or dropped connection is not retried: n8n may already
+    be running the workflow, and every retry would start another LLM run
+    for the same resume. Other 4xx responses are returned to the caller as
+    errors straight away, since retrying them cannot succeed.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = N8N_MAX_RETRIES,
+        retry_base_delay: float = N8N_RETRY_BASE_DELAY,
+        retry_max_delay: float = N8N_RETRY_MAX_DELAY,
+    ):
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.breaker = CircuitBreaker(N8N_BREAKER_FAILURE_THRESHOLD, N8N_BREAKER_RESET_TIMEOUT)
+        self._session = None
+        self.requests = 0
+        self.retries = 0
+
+    def start(self) -> None:
+        connector = aiohttp.TCPConnector(
+            limit=N8N_MAX_CONNECTIONS,
+            limit_per_host=N8N_MAX_CONNECTIONS,
+            keepalive_timeout=N8N_KEEPALIVE_TIMEOUT,
+        )
+        timeout = aiohttp.ClientTimeout(connect=N8N_CONNECT_TIMEOUT, sock_read=N8N_READ_TIMEOUT)
+        self._session = aiohttp.ClientSession(
+            connector=connector, timeout=timeout, trace_configs=[_body_sent_trace()]
+        )
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def max_call_duration(self) -> float:
+        """Longest a ``post_json`` call can take with every attempt timing out"""
+        attempts = self.max_retries + 1
+        return attempts * (N8N_CONNECT_TIMEOUT + N8N_READ_TIMEOUT) + self.max_retries * self.retry_max_delay
+
+    def _retry_delay(self, attempt: int) -> float:
+        delay = min(self.retry_base_delay * (2 ** attempt), self.retry_max_delay)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def post_json(self, url: str, payload: dict):
+        """POST ``payload`` and return the decoded JSON response"""
+        self.breaker.before_call()
+        try:
+            return await self._post_with_retries(url, payload)
+        except BaseException:
+            # Cancelled, or failed in a way that says nothing about n8n's health
+            self.breaker.cancel_call()
+            raise
+
+    async def _post_with_retries(self, url: str, payload: dict):
+        attempt = 0
+        while True:
+            self.requests += 1
+            request = {"body_sent": False}
+            try:
+                async with self._session.post(url, json=payload, trace_request_ctx=request) as response:
+                    if response.status < 400:
+                        try:
+                            result = await response.json(content_type=None)
+                        except ValueError:
+                            error = N8nError(f"{response.status} - response is not JSON", response.status)
+                            retryable = False
+                        else:
+                            self.breaker.record_success()
+                            return result
+                    else:
+                        error = N8nError(f"{response.status} - {await response.text()}", response.status)
+                        retryable = response.status == 429 or response.status >= 500
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                reason = str(e) or e.__class__.__name__
+                if request["body_sent"]:
+                    # n8n may be running the workflow; fail the attempt rather than start a second run
+                    self.breaker.record_failure()
+                    raise N8nError(f"no response after the request was sent: {reason}")
+                error = N8nError(f"connection failed: {reason}")
+                retryable = True
+
+            if not retryable:
+                # n8n is up and rejected the request; not a reason to open the circuit
+                self.breaker.record_success()
+                raise error
+            if attempt >= self.max_retries:
+                self.breaker.record_failure()
+                raise error
+            self.retries += 1
+            await asyncio.sleep(self._retry_delay(attempt))
+            attempt += 1
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "circuit_breaker": self.breaker.stats(),
+        }
+
+
+def _body_sent_trace() -> aiohttp.TraceConfig:
+    """Marks ``trace_request_ctx["body_sent"]`` once any of a request's body is written"""
+    async def on_chunk_sent(session, context, params):
+        context.trace_request_ctx["body_sent"] = True
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_chunk_sent.append(on_chunk_sent)
+    return trace
+
+
+_client = None
+
+
+def init_n8n_client() -> N8nClient:
+    """Create the shared client (called from the app lifespan, on the event loop)"""
+    global _client
+    if _client is None:
+        client = N8nClient()
+        client.start()
+        _client = client
+    return _client
+
+
+async def close_n8n_client() -> None:
+    """Close the shared client's connections (called from the app lifespan)"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def get_n8n_client() -> N8nClient:
+    if _client is None:
+        raise RuntimeError("n8n client is not initialized")
+    return _client
+
+
+def n8n_client_stats() -> dict:
+    return _client.stats() if _client is not None else {}
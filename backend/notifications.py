@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+import psycopg2
+from psycopg2 import extensions
+from database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# channel -> callbacks(payload), registered at import time by the modules that need them
+_subscriptions = defaultdict(list)
+
+# Pseudo-channel: subscribers are called after the listener reconnects
+RECONNECTED_CHANNEL = "__reconnected__"
+
+# Advisory locks this process wants to own, registered at import time like subscriptions
+_advisory_locks = set()
+
+# Seconds between attempts to take an advisory lock another process holds
+ADVISORY_LOCK_RETRY_INTERVAL = 5.0
+
+
+def subscribe(channel: str, callback) -> None:
+    """
+    Call ``callback(payload)`` on the event loop for every NOTIFY on ``channel``
+
+    Callbacks must be quick and must not block; they run inline in the
+    listener's reader callback.
+    """
+    _subscriptions[channel].append(callback)
+    if _listener is not None:
+        _listener.listen(channel)
+
+
+def want_advisory_lock(lock_id: int) -> None:
+    """
+    Have the LISTEN connection try to hold the session advisory lock ``lock_id``
+
+    Lets one process among many own a duty; check ``holds_advisory_lock``
+    before doing it. Attempts run in the background every
+    ADVISORY_LOCK_RETRY_INTERVAL seconds until the lock is taken, and the
+    lock is released with the connection, so a surviving process takes
+    over when the holder goes away.
+    """
+    _advisory_locks.add(lock_id)
+
+
+class NotificationListener:
+    """
+    One dedicated LISTEN connection per process, fanned out to subscribers.
+
+    The connection is outside the pool because it stays idle in LISTEN mode
+    for the life of the process. Its socket is watched with
+    ``loop.add_reader``, so no thread blocks waiting for notifications, and
+    it reconnects with backoff if the connection drops or cannot be opened
+    at start-up.
+    """
+
+    def __init__(self, dsn: str = DATABASE_URL, reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0):
+        self.dsn = dsn
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._conn = None
+        self._loop = None
+        self._listening = set()
+        self._held_locks = set()
+        self._reconnect_task = None
+        self._lock_task = None
+        self._stopping = False
+        self.notifications_total = 0
+        self.reconnects_total = 0
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        try:
+            await self._connect()
+        except psycopg2.Error as e:
+            # The database may still be starting; keep trying in the background
+            logger.warning("Could not open LISTEN connection: %s", e)
+            self._schedule_reconnect()
+        self._lock_task = self._loop.create_task(self._take_advisory_locks())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._lock_task is not None:
+            self._lock_task.cancel()
+            self._lock_task = None
+        self._disconnect()
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None and not self._conn.closed
+
+    def listen(self, channel: str) -> None:
+        """Start listening on a channel subscribed after start-up"""
+        if channel == RECONNECTED_CHANNEL:
+            return
+        if self.connected and channel not in self._listening:
+            with self._conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {extensions.quote_ident(channel, self._conn)}")
+            self._listening.add(channel)
+
+    def holds_advisory_lock(self, lock_id: int) -> bool:
+        """True while this connection holds the advisory lock ``lock_id``"""
+        return lock_id in self._held_locks
+
+    async def _take_advisory_locks(self) -> None:
+        while not self._stopping:
+            for lock_id in sorted(_advisory_locks - self._held_locks):
+                if not self.connected:
+                    break
+                await self._try_advisory_lock(lock_id)
+            await asyncio.sleep(ADVISORY_LOCK_RETRY_INTERVAL)
+
+    async def _try_advisory_lock(self, lock_id: int) -> None:
+        conn = self._conn
+        # The query runs in a thread; stop watching the socket so the loop never waits on the connection
+        self._loop.remove_reader(conn.fileno())
+        try:
+            acquired = await self._loop.run_in_executor(None, _try_advisory_lock, conn, lock_id)
+        except psycopg2.Error as e:
+            logger.warning("Could not try advisory lock %s: %s", lock_id, e)
+            if self._conn is conn:
+                self._disconnect()
+                self._schedule_reconnect()
+            return
+        if self._conn is not conn:
+            return
+        if acquired:
+            self._held_locks.add(lock_id)
+        self._loop.add_reader(conn.fileno(), self._on_readable)
+        # Notifications read along with the query result would otherwise wait for the next one
+        self._dispatch()
+
+    async def _connect(self) -> None:
+        conn = await self._loop.run_in_executor(None, psycopg2.connect, self.dsn)
+        conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        self._conn = conn
+        self._listening = set()
+        self._held_locks = set()
+        for channel in list(_subscriptions):
+            self.listen(channel)
+        self._loop.add_reader(conn.fileno(), self._on_readable)
+
+    def _disconnect(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            self._loop.remove_reader(self._conn.fileno())
+        except (ValueError, OSError, psycopg2.InterfaceError):
+            pass
+        try:
+            self._conn.close()
+        except psycopg2.Error:
+            pass
+        self._conn = None
+
+    def _on_readable(self) -> None:
+        try:
+            self._conn.poll()
+        except psycopg2.Error as e:
+            logger.warning("LISTEN connection lost: %s", e)
+            self._disconnect()
+            self._schedule_reconnect()
+            return
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._conn.notifies:
+            notify = self._conn.notifies.pop(0)
+            self.notifications_total += 1
+            for callback in _subscriptions.get(notify.channel, []):
+                try:
+                    callback(notify.payload)
+                except Exception as e:
+                    logger.error("Notification handler for %s failed: %s", notify.channel, e)
+
+    def _schedule_reconnect(self) -> None:
+        if not self._stopping and self._reconnect_task is None:
+            self._reconnect_task = self._loop.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = self.reconnect_delay
+        try:
+            while not self._stopping:
+                await asyncio.sleep(delay)
+                try:
+                    await self._connect()
+                    self.reconnects_total += 1
+                    # Anything cached may have missed notifications while disconnected
+                    for callback in _subscriptions.get(RECONNECTED_CHANNEL, []):
+                        callback(None)
+                    return
+                except psycopg2.Error as e:
+                    logger.warning("Could not reconnect LISTEN connection: %s", e)
+                    delay = min(delay * 2, self.max_reconnect_delay)
+        finally:
+            self._reconnect_task = None
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "channels": sorted(self._listening),
+            "advisory_locks": sorted(self._held_locks),
+            "notifications_total": self.notifications_total,
+            "reconnects_total": self.reconnects_total,
+        }
+def _try_advisory_lock(conn, lock_id: int) -> bool:
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (lock_id,))
+        return cursor.fetchone()[0]
+
+
+_listener = None
+
+
+async def init_listener() -> NotificationListener:
+    """Open the shared LISTEN connection (called from the app lifespan)"""
+    global _listener
+    if _listener is None:
+        listener = NotificationListener()
+        await listener.start()
+        _listener = listener
+    return _listener
+
+
+async def close_listener() -> None:
+    """Close the shared LISTEN connection (called from the app lifespan)"""
+    global _listener
+    if _listener is not None:
+        await _listener.stop()
+        _listener = None
+
+
+def holds_advisory_lock(lock_id: int) -> bool:
+    """Whether this process's LISTEN connection holds ``lock_id``; False without a listener"""
+    return _listener is not None and _listener.holds_advisory_lock(lock_id)
+
+
+def listener_stats() -> dict:
+    return _listener.stats() if _listener is not None else {}
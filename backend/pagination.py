@@ -0,0 +1,42 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+
+
+def encode_cursor(**values) -> str:
+    """Pack keyset values into an opaque, URL-safe page token"""
+    payload = {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in values.items()
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _parse_cursor_value(value, kind: type):
+    if kind is datetime:
+        return datetime.fromisoformat(value)
+    if kind is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if type(value) is not kind:
+        raise TypeError(f"expected {kind.__name__}")
+    return value
+
+
+def decode_cursor(token: str, **types: type) -> dict:
+    """
+    Unpack a page token made by ``encode_cursor``; raises 400 if it is malformed
+
+    Each keyword names a key the token must hold and its type (``int``,
+    ``float`` or ``datetime``, stored as an ISO timestamp), so a tampered
+    token is rejected here instead of failing in SQL.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, dict) or any(key not in payload for key in types):
+            raise ValueError("missing keys")
+        return {key: _parse_cursor_value(payload[key], kind) for key, kind in types.items()}
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import logging
+import os
+import notifications
+from metrics import observe_status_transition
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+STATUS_STREAM_HEARTBEAT = float(os.getenv("STATUS_STREAM_HEARTBEAT", "15"))
+STATUS_STREAM_QUEUE_SIZE = int(os.getenv("STATUS_STREAM_QUEUE_SIZE", "100"))
+
+RESUME_STATUS_CHANNEL = "resume_status"
+# Session advisory lock of the one API process that counts status transitions
+STATUS_METRICS_LOCK_ID = 727002
+TERMINAL_STATUSES = {"completed", "failed"}
+
+# Queued to every subscriber after the LISTEN connection reconnects, since events may have been missed
+RESYNC = {"resync": True}
+
+
+class StatusSubscription:
+    """Queue of status events for one resume, or for every resume of one user"""
+
+    def __init__(self, resume_id: int = None, user_id: int = None, queue_size: int = STATUS_STREAM_QUEUE_SIZE):
+        self.resume_id = resume_id
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def matches(self, event: dict) -> bool:
+        if self.resume_id is not None and event.get("resume_id") != self.resume_id:
+            return False
+        if self.user_id is not None and event.get("user_id") != self.user_id:
+            return False
+        return True
+
+    def push(self, event: dict) -> bool:
+        """Queue an event; returns False if the oldest queued event had to be dropped"""
+        # A slow client loses its oldest events rather than holding up the listener
+        dropped = self.queue.full()
+        if dropped:
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+        return not dropped
+
+
+class StatusBroadcaster:
+    """
+    Fans ``resume_status`` notifications out to open status streams.
+
+    A trigger on ``resumes`` sends a notification whenever a row's
+    ``analysis_status`` changes, and the process-wide LISTEN connection
+    calls ``publish`` on the event loop; streams never touch the database
+    while they wait. Every API process receives every notification, so
+    only the process holding STATUS_METRICS_LOCK_ID counts them as
+    transitions; that includes changes n8n writes to the table directly.
+    """
+
+    def __init__(self):
+        self._subscriptions = set()
+        self.events_total = 0
+        self.dropped_total = 0
+
+    def subscribe(self, resume_id: int = None, user_id: int = None) -> StatusSubscription:
+        subscription = StatusSubscription(resume_id=resume_id, user_id=user_id)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: StatusSubscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def publish(self, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed %s payload: %r", RESUME_STATUS_CHANNEL, payload)
+            return
+        self.events_total += 1
+        if notifications.holds_advisory_lock(STATUS_METRICS_LOCK_ID):
+            observe_status_transition(event.get("previous_status"), event.get("analysis_status"))
+        for subscription in list(self._subscriptions):
+            if subscription.matches(event) and not subscription.push(event):
+                self.dropped_total += 1
+
+    def resync(self, _payload=None) -> None:
+        for subscription in list(self._subscriptions):
+            subscription.push(RESYNC)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscriptions),
+            "events_total": self.events_total,
+            "dropped_total": self.dropped_total,
+        }
+
+
+status_broadcaster = StatusBroadcaster()
+
+notifications.subscribe(RESUME_STATUS_CHANNEL, status_broadcaster.publish)
+notifications.subscribe(notifications.RECONNECTED_CHANNEL, status_broadcaster.resync)
+notifications.want_advisory_lock(STATUS_METRICS_LOCK_ID)
@@ -0,0 +1,322 @@
+import asyncio
+import logging
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timedelta
+import zstandard
+from database import get_db_connection, run_db
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/app/uploads")
+STORAGE_ARCHIVE_DIR = os.getenv("STORAGE_ARCHIVE_DIR", "/app/archive")
+STORAGE_SHARD_LEVELS = int(os.getenv("STORAGE_SHARD_LEVELS", "2"))  # directory levels of 2 hex characters
+STORAGE_COMPRESS_AFTER_DAYS = float(os.getenv("STORAGE_COMPRESS_AFTER_DAYS", "0"))  # 0 never compresses
+STORAGE_ZSTD_LEVEL = int(os.getenv("STORAGE_ZSTD_LEVEL", "10"))
+STORAGE_RETENTION_DAYS = float(os.getenv("STORAGE_RETENTION_DAYS", "0"))  # 0 keeps originals forever
+STORAGE_RETENTION_ACTION = os.getenv("STORAGE_RETENTION_ACTION", "delete")  # delete or archive
+STORAGE_GC_INTERVAL = float(os.getenv("STORAGE_GC_INTERVAL", "3600"))  # seconds between sweeps; 0 disables
+STORAGE_GC_BATCH = int(os.getenv("STORAGE_GC_BATCH", "500"))
+STORAGE_TEMP_MAX_AGE = float(os.getenv("STORAGE_TEMP_MAX_AGE", "3600"))  # seconds before a stray .part is removed
+
+RETENTION_ACTIONS = ("delete", "archive")
+if STORAGE_RETENTION_ACTION not in RETENTION_ACTIONS:
+    raise ValueError(f"STORAGE_RETENTION_ACTION must be one of: {', '.join(RETENTION_ACTIONS)}")
+
+# Uploads in progress; kept apart so sweeping them never lists the stored files
+TEMP_DIR = os.path.join(UPLOAD_DIR, ".tmp")
+ZSTD_SUFFIX = ".zst"
+
+# Session advisory lock held by the process that is sweeping
+STORAGE_GC_LOCK_ID = 727001
+
+os.makedirs(TEMP_DIR, exist_ok=True)
+
+
+def storage_key(sha256: str, file_extension: str) -> str:
+    """
+    Path of a stored file relative to UPLOAD_DIR, e.g. ``ab/cd/abcd...ef.pdf``
+
+    Files are content-addressed and spread over ``256 ** STORAGE_SHARD_LEVELS``
+    directories by hash prefix, so no directory grows past a few thousand
+    entries even with millions of files.
+    """
+    shards = [sha256[level * 2:level * 2 + 2] for level in range(STORAGE_SHARD_LEVELS)]
+    return os.path.join(*shards, f"{sha256}{file_extension}")
+
+
+def upload_path(key: str) -> str:
+    return os.path.join(UPLOAD_DIR, key)
+
+
+def original_path(key: str, content_hash: str) -> str:
+    """Where a resume's original is, including files stored flat before sharding"""
+    return upload_path(key) if key else upload_path(f"{content_hash}.pdf")
+
+
+def temp_upload_path() -> str:
+    return os.path.join(TEMP_DIR, f"{uuid.uuid4()}.part")
+
+
+def commit_upload(temp_path: str, key: str) -> str:
+    """Move a finished upload into place; a file that is already stored is kept and the copy dropped"""
+    path = upload_path(key)
+    if os.path.exists(path):
+        remove_quietly(temp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+    return path
+
+
+def remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _write_atomically(destination: str, write) -> None:
+    """Call ``write(file)`` on a temporary file next to ``destination``, then rename it into place"""
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    temp_path = f"{destination}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        with open(temp_path, "wb") as f:
+            write(f)
+        os.replace(temp_path, destination)
+    except BaseException:
+        remove_quietly(temp_path)
+        raise
+
+
+def _compress_to(source: str, destination: str) -> None:
+    compressor = zstandard.ZstdCompressor(level=STORAGE_ZSTD_LEVEL)
+    with open(source, "rb") as f:
+        _write_atomically(destination, lambda out: compressor.copy_stream(f, out))
+
+
+def _copy_to(source: str, destination: str) -> None:
+    with open(source, "rb") as f:
+        _write_atomically(destination, lambda out: shutil.copyfileobj(f, out))
+
+
+def _candidates(status: str, cutoff: datetime, after: tuple, limit: int) -> list:
+    """
+    The next ``limit`` resumes past ``after`` (updated_at, id) whose file is due
+
+    A keyset scan over ``idx_resumes_storage_sweep`` in (updated_at, id)
+    order, so each batch reads only its own rows however large the table
+    grows. Resumes share a stored file when their content is identical, so
+    a row is only returned once nothing still being analysed (or recently
+    analysed) refers to the same content. A new upload of that content
+    reuses the completed analysis and never needs the file again.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT r.updated_at, r.id, r.content_hash, r.storage_key
+                FROM resumes r
+                WHERE r.storage_status = %s AND r.analysis_status = 'completed'
+                  AND r.updated_at < %s AND (r.updated_at, r.id) > (%s, %s)
+                  AND r.content_hash IS NOT NULL
+                  AND NOT EXISTS (
+                      SELECT 1 FROM resumes o
+                      WHERE o.content_hash = r.content_hash
+                        AND (o.analysis_status <> 'completed' OR o.updated_at >= %s)
+                  )
+                ORDER BY r.updated_at, r.id
+                LIMIT %s
+            """, (status, cutoff, *after, cutoff, limit))
+            rows = cursor.fetchall()
+        conn.commit()
+    return rows
+
+
+def _record(content_hash: str, status: str, cutoff: datetime, new_status: str, new_key) -> bool:
+    """Point every resume with this content at the new location, unless one became active meanwhile"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE resumes SET storage_status = %s, storage_key = %s, storage_updated_at = %s
+                WHERE content_hash = %s AND storage_status = %s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM resumes o
+                      WHERE o.content_hash = %s
+                        AND (o.analysis_status <> 'completed' OR o.updated_at >= %s)
+                  )
+            """, (new_status, new_key, datetime.utcnow(), content_hash, status, content_hash, cutoff))
+            updated = cursor.rowcount
+            conn.commit()
+    return updated > 0
+
+
+def _move(content_hash: str, key, status: str, cutoff: datetime, new_status: str) -> bool:
+    """
+    Compress, archive or delete one stored file and record where it went
+
+    The new copy is written before the database points at it and the old
+    file is removed only afterwards, so a crash never leaves a resume
+    pointing at a missing file.
+    """
+    source = original_path(key, content_hash)
+    # Files stored flat before sharding move into the sharded layout
+    stored_key = key or storage_key(content_hash, ".pdf")
+    compress = not stored_key.endswith(ZSTD_SUFFIX)
+    new_key = None
+    destination = None
+    if new_status != "deleted":
+        new_key = stored_key + ZSTD_SUFFIX if compress else stored_key
+        root = STORAGE_ARCHIVE_DIR if new_status == "archived" else UPLOAD_DIR
+        destination = os.path.join(root, new_key)
+        if not os.path.exists(source):
+            logger.warning("Stored file %s is missing; recording it as deleted", source)
+            new_status, new_key, destination = "deleted", None, None
+        elif compress:
+            _compress_to(source, destination)
+        else:
+            _copy_to(source, destination)
+
+    if not _record(content_hash, status, cutoff, new_status, new_key):
+        if destination and destination != source:
+            remove_quietly(destination)
+        return False
+    if destination != source:
+        remove_quietly(source)
+    return True
+
+
+class StorageSweeper:
+    """
+    Background garbage collection of uploaded originals
+
+    Every ``interval`` seconds it compresses originals whose resumes
+    completed ``STORAGE_COMPRESS_AFTER_DAYS`` ago, deletes or archives them
+    ``STORAGE_RETENTION_DAYS`` after completion, and removes uploads
+    abandoned in the temporary directory. Every API process and worker may
+    run one; an advisory lock lets only one of them sweep at a time.
+    """
+
+    def __init__(self, interval: float = STORAGE_GC_INTERVAL, batch_size: int = STORAGE_GC_BATCH):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task = None
+        self._stop = asyncio.Event()
+        # Checked between batches by the sweeping thread, so shutdown does not wait out a long backlog
+        self._stopping = False
+        self.sweeps = 0
+        self.last_sweep_timestamp_seconds = None
+        self.totals = {"compressed": 0, "archived": 0, "deleted": 0, "temp_removed": 0, "errors": 0}
+
+    def start(self) -> None:
+        if self.interval > 0 and (STORAGE_RETENTION_DAYS or STORAGE_COMPRESS_AFTER_DAYS):
+            self._stop.clear()
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopping = True
+        self._stop.set()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                result = await run_db(self.sweep)
+                if result and any(result[action] for action in self.totals):
+                    logger.info("Storage sweep: %s", result)
+            except Exception as e:
+                logger.warning("Storage sweep failed: %s", e)
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def sweep(self) -> dict:
+        """One pass over every policy (blocking); None when another process holds the sweep lock"""
+        with get_db_connection() as lock_conn:
+            with lock_conn.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", (STORAGE_GC_LOCK_ID,))
+                locked = cursor.fetchone()[0]
+                lock_conn.commit()
+                if not locked:
+                    return None
+                try:
+                    return self._sweep()
+                finally:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", (STORAGE_GC_LOCK_ID,))
+                    lock_conn.commit()
+
+    def _sweep(self) -> dict:
+        started = time.monotonic()
+        now = datetime.utcnow()
+        result = dict.fromkeys(self.totals, 0)
+        result["temp_removed"] = self._remove_stale_temp_files()
+
+        phases = []
+        if STORAGE_COMPRESS_AFTER_DAYS:
+            phases.append(("stored", "compressed", now - timedelta(days=STORAGE_COMPRESS_AFTER_DAYS)))
+        if STORAGE_RETENTION_DAYS:
+            new_status = "archived" if STORAGE_RETENTION_ACTION == "archive" else "deleted"
+            cutoff = now - timedelta(days=STORAGE_RETENTION_DAYS)
+            phases += [(status, new_status, cutoff) for status in ("stored", "compressed")]
+
+        for status, new_status, cutoff in phases:
+            # Rows are visited once per sweep, so a file that fails is retried on the next one
+            after = (datetime.min, 0)
+            while not self._stopping:
+                candidates = _candidates(status, cutoff, after, self.batch_size)
+                done = set()
+                for updated_at, resume_id, content_hash, key in candidates:
+                    after = (updated_at, resume_id)
+                    # Every resume sharing the file is updated with the first one, so later batches skip them
+                    if content_hash in done:
+                        continue
+                    done.add(content_hash)
+                    try:
+                        result[new_status] += _move(content_hash, key, status, cutoff, new_status)
+                    except Exception as e:
+                        result["errors"] += 1
+                        logger.warning("Could not move stored file for %s: %s", content_hash, e)
+                if len(candidates) < self.batch_size:
+                    break
+
+        for action, count in result.items():
+            self.totals[action] += count
+        result["took_seconds"] = round(time.monotonic() - started, 2)
+        self.sweeps += 1
+        self.last_sweep_timestamp_seconds = time.time()
+        return result
+
+    def _remove_stale_temp_files(self) -> int:
+        removed = 0
+        cutoff = time.time() - STORAGE_TEMP_MAX_AGE
+        with os.scandir(TEMP_DIR) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "interval": self.interval,
+            "compress_after_days": STORAGE_COMPRESS_AFTER_DAYS,
+            "retention_days": STORAGE_RETENTION_DAYS,
+            "retention_action": STORAGE_RETENTION_ACTION,
+            "sweeps": self.sweeps,
+            "last_sweep_timestamp_seconds": self.last_sweep_timestamp_seconds,
+            "totals": dict(self.totals),
+        }
+
+
+storage_sweeper = StorageSweeper()
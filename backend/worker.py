@@ -0,0 +1,51 @@
+import asyncio
+import logging
+import os
+import signal
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from database import init_db_pool, close_db_pool, run_db, pool_stats
+from jobs import AnalysisWorkerPool, ANALYSIS_WORKER_CONCURRENCY
+from extraction import init_extractor, close_extractor
+from n8n_client import init_n8n_client, close_n8n_client, n8n_client_stats
+from upload import run_analysis_job, analysis_job_budget
+from metrics import register_stats, serve_metrics
+from storage import storage_sweeper
+
+# Configuration
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))  # 0 disables the metrics server
+
+async def main():
+    """Run the analysis worker pool outside the API process"""
+    await run_db(init_db_pool)
+    await run_db(init_extractor)
+    init_n8n_client()
+    if WORKER_METRICS_PORT:
+        register_stats("db_pool", pool_stats)
+        register_stats("n8n_client", n8n_client_stats)
+        register_stats("storage", storage_sweeper.stats)
+        serve_metrics(WORKER_METRICS_PORT)
+    workers = AnalysisWorkerPool(
+        run_analysis_job, concurrency=max(ANALYSIS_WORKER_CONCURRENCY, 1), handler_budget=analysis_job_budget()
+    )
+    workers.start()
+    storage_sweeper.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    await storage_sweeper.stop()
+    await workers.stop()
+    await run_db(close_extractor)
+    await close_n8n_client()
+    await run_db(close_db_pool)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,20 +1,82 @@
+-- Trigram matching for job title search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Create the resumes table
 CREATE TABLE IF NOT EXISTS resumes (
     id SERIAL PRIMARY KEY,
     filename VARCHAR(255) NOT NULL,
+    user_id INTEGER, -- users.id of the uploader
+    content_hash CHAR(64), -- SHA-256 of the uploaded file
     full_name VARCHAR(255),
     email VARCHAR(255),
     phone VARCHAR(50),
     skills TEXT[], -- PostgreSQL array for skills
+    skill_keys TEXT[], -- lower-case normalized skills, used for search
     experience_years INTEGER,
     last_job_title VARCHAR(255),
     uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     raw_text TEXT, -- Store the extracted text
     analysis_status VARCHAR(50) DEFAULT 'pending', -- pending, processing, completed, failed
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Original file: path under UPLOAD_DIR (or STORAGE_ARCHIVE_DIR once archived), NULL once deleted
+    storage_key TEXT,
+    storage_status VARCHAR(20) NOT NULL DEFAULT 'stored', -- stored, compressed, archived, deleted
+    storage_updated_at TIMESTAMP,
+    -- Full-text search: name and job title weigh more than the body text
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', COALESCE(full_name, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(last_job_title, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(raw_text, '')), 'C')
+    ) STORED
+);
+
+-- Durable queue of analysis jobs, leased by workers with FOR UPDATE SKIP LOCKED
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+    id SERIAL PRIMARY KEY,
+    resume_id INTEGER NOT NULL REFERENCES resumes(id) ON DELETE CASCADE,
+    file_path TEXT NOT NULL,
+    filename VARCHAR(255) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued', -- queued, running, completed, dead
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP, -- earliest time of the next attempt
+    locked_until TIMESTAMP, -- lease expiry while running
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- MinHash signatures of resume text, for near-duplicate detection
+CREATE TABLE IF NOT EXISTS resume_signatures (
+    resume_id INTEGER PRIMARY KEY REFERENCES resumes(id) ON DELETE CASCADE,
+    signature BYTEA NOT NULL, -- 128 little-endian uint32 MinHash values
+    lsh_bands BIGINT[] NOT NULL, -- one hash per LSH band; resumes sharing one are compared
+    cluster_id INTEGER, -- smallest resume id of its near-duplicate group, set by the clustering job
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Aggregates for GET /analytics/summary, kept up to date by the trg_resumes_stats_* triggers
+-- dimension: 'status' (every resume), 'skill' and 'experience' (completed resumes only)
+CREATE TABLE IF NOT EXISTS resume_stats (
+    dimension VARCHAR(20) NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, value)
+);
+
+-- The same counts per day of uploaded_at (UTC), for time buckets
+CREATE TABLE IF NOT EXISTS resume_stats_daily (
+    day DATE NOT NULL,
+    dimension VARCHAR(20) NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, day, value)
+);
+
+-- Most common values of a dimension, read in order for the top skills
+CREATE INDEX IF NOT EXISTS idx_resume_stats_top ON resume_stats(dimension, count DESC, value);
+
 -- Create users table for authentication
 CREATE TABLE IF NOT EXISTS users (
     id SERIAL PRIMARY KEY,
@@ -32,5 +94,171 @@ ON CONFLICT (username) DO NOTHING;
 
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_resumes_email ON resumes(email);
-CREATE INDEX IF NOT EXISTS idx_resumes_uploaded_at ON resumes(uploaded_at);
+CREATE INDEX IF NOT EXISTS idx_resumes_user_id ON resumes(user_id);
+-- Keyset pagination on GET /resumes: ORDER BY uploaded_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_resumes_uploaded_at_id ON resumes(uploaded_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_resumes_status ON resumes(analysis_status);
+-- Incremental refresh of the match index (POST /match)
+CREATE INDEX IF NOT EXISTS idx_resumes_updated_at ON resumes(updated_at);
+CREATE INDEX IF NOT EXISTS idx_resumes_content_hash ON resumes(content_hash, updated_at DESC) WHERE analysis_status = 'completed';
+-- Storage sweeper: originals due for compression or retention, and the other resumes sharing a file
+CREATE INDEX IF NOT EXISTS idx_resumes_storage_sweep ON resumes(storage_status, updated_at, id)
+    WHERE analysis_status = 'completed' AND storage_status <> 'deleted';
+CREATE INDEX IF NOT EXISTS idx_resumes_content_hash_all ON resumes(content_hash);
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_resume_id ON analysis_jobs(resume_id);
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_queued ON analysis_jobs(run_after, id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_running ON analysis_jobs(locked_until) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_completed ON analysis_jobs(updated_at) WHERE status = 'completed';
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_dead ON analysis_jobs(updated_at) WHERE status = 'dead';
+
+-- Skill search (GET /resumes/search)
+CREATE INDEX IF NOT EXISTS idx_resumes_skill_keys ON resumes USING GIN (skill_keys);
+CREATE INDEX IF NOT EXISTS idx_resumes_completed_experience ON resumes(experience_years) WHERE analysis_status = 'completed';
+CREATE INDEX IF NOT EXISTS idx_resumes_job_title_trgm ON resumes USING GIN (last_job_title gin_trgm_ops);
+
+-- Full-text search (GET /resumes/fulltext)
+CREATE INDEX IF NOT EXISTS idx_resumes_search_vector ON resumes USING GIN (search_vector);
+
+-- Near-duplicate lookup (GET /resumes/{id}/duplicates) and clusters
+CREATE INDEX IF NOT EXISTS idx_resume_signatures_lsh_bands ON resume_signatures USING GIN (lsh_bands);
+CREATE INDEX IF NOT EXISTS idx_resume_signatures_cluster_id ON resume_signatures(cluster_id) WHERE cluster_id IS NOT NULL;
+
+-- Tell API processes to drop cached principals when a user changes or is deleted
+CREATE OR REPLACE FUNCTION notify_user_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('user_changed', OLD.username);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_users_notify_changed ON users;
+CREATE TRIGGER trg_users_notify_changed
+    AFTER UPDATE OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_user_changed();
+
+-- Push analysis status changes to GET /api/upload/status/stream subscribers
+CREATE OR REPLACE FUNCTION notify_resume_status() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.analysis_status IS NOT DISTINCT FROM NEW.analysis_status THEN
+        RETURN NULL;
+    END IF;
+    PERFORM pg_notify('resume_status', json_build_object(
+        'resume_id', NEW.id,
+        'user_id', NEW.user_id,
+        'analysis_status', NEW.analysis_status,
+        'previous_status', CASE WHEN TG_OP = 'UPDATE' THEN OLD.analysis_status END,
+        'updated_at', NEW.updated_at
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_resumes_notify_status ON resumes;
+CREATE TRIGGER trg_resumes_notify_status
+    AFTER INSERT OR UPDATE OF analysis_status ON resumes
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_resume_status();
+
+-- Tell API processes to drop deleted resumes from the match index
+CREATE OR REPLACE FUNCTION notify_resume_deleted() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('resume_deleted', OLD.id::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_resumes_notify_deleted ON resumes;
+CREATE TRIGGER trg_resumes_notify_deleted
+    AFTER DELETE ON resumes
+    FOR EACH ROW EXECUTE FUNCTION notify_resume_deleted();
+
+-- What one resume contributes to resume_stats
+CREATE OR REPLACE FUNCTION resume_stat_facts(status TEXT, skill_keys TEXT[], experience_years INTEGER)
+RETURNS TABLE (dimension TEXT, value TEXT) AS $$
+    SELECT 'status', COALESCE(status, 'unknown')
+    UNION ALL
+    SELECT 'experience', experience_years::text
+    WHERE status = 'completed' AND experience_years IS NOT NULL
+    UNION ALL
+    SELECT DISTINCT 'skill', skill_key
+    FROM unnest(skill_keys) AS skill_key
+    WHERE status = 'completed' AND skill_key IS NOT NULL
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Add count deltas to both aggregate tables; rows are locked in key order so concurrent batches cannot deadlock
+CREATE OR REPLACE FUNCTION apply_resume_stat_deltas(days DATE[], dimensions TEXT[], stat_values TEXT[], deltas INTEGER[])
+RETURNS void AS $$
+    WITH changes AS (
+        SELECT day, dimension, value, sum(delta)::integer AS delta
+        FROM unnest(days, dimensions, stat_values, deltas) AS c(day, dimension, value, delta)
+        GROUP BY day, dimension, value
+    ), daily AS (
+        INSERT INTO resume_stats_daily AS s (day, dimension, value, count)
+        SELECT day, dimension, value, delta FROM changes
+        WHERE day IS NOT NULL AND delta <> 0
+        ORDER BY dimension, day, value
+        ON CONFLICT (dimension, day, value) DO UPDATE SET count = s.count + EXCLUDED.count
+    )
+    INSERT INTO resume_stats AS s (dimension, value, count)
+    SELECT dimension, value, sum(delta) FROM changes
+    GROUP BY dimension, value
+    HAVING sum(delta) <> 0
+    ORDER BY dimension, value
+    ON CONFLICT (dimension, value) DO UPDATE SET count = s.count + EXCLUDED.count;
+$$ LANGUAGE sql;
+
+-- Statement-level, so a batch insert or update applies its deltas once
+CREATE OR REPLACE FUNCTION update_resume_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM apply_resume_stat_deltas(array_agg(day), array_agg(dimension), array_agg(value), array_agg(delta))
+        FROM (
+            SELECT n.uploaded_at::date AS day, f.dimension, f.value, 1 AS delta
+            FROM new_rows n, resume_stat_facts(n.analysis_status, n.skill_keys, n.experience_years) f
+        ) changes;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM apply_resume_stat_deltas(array_agg(day), array_agg(dimension), array_agg(value), array_agg(delta))
+        FROM (
+            SELECT o.uploaded_at::date AS day, f.dimension, f.value, -1 AS delta
+            FROM old_rows o, resume_stat_facts(o.analysis_status, o.skill_keys, o.experience_years) f
+        ) changes;
+    ELSE
+        -- Most updates (raw text, extracted contact fields) change nothing that is counted
+        PERFORM apply_resume_stat_deltas(array_agg(day), array_agg(dimension), array_agg(value), array_agg(delta))
+        FROM (
+            SELECT changed.day, f.dimension, f.value, changed.delta
+            FROM (
+                SELECT o.uploaded_at::date AS day, o.analysis_status, o.skill_keys, o.experience_years, -1 AS delta
+                FROM old_rows o JOIN new_rows n ON n.id = o.id
+                WHERE (o.analysis_status, o.skill_keys, o.experience_years, o.uploaded_at::date)
+                      IS DISTINCT FROM (n.analysis_status, n.skill_keys, n.experience_years, n.uploaded_at::date)
+                UNION ALL
+                SELECT n.uploaded_at::date, n.analysis_status, n.skill_keys, n.experience_years, 1
+                FROM old_rows o JOIN new_rows n ON n.id = o.id
+                WHERE (o.analysis_status, o.skill_keys, o.experience_years, o.uploaded_at::date)
+                      IS DISTINCT FROM (n.analysis_status, n.skill_keys, n.experience_years, n.uploaded_at::date)
+            ) changed,
+            resume_stat_facts(changed.analysis_status, changed.skill_keys, changed.experience_years) f
+        ) changes;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_resumes_stats_insert ON resumes;
+CREATE TRIGGER trg_resumes_stats_insert
+    AFTER INSERT ON resumes
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_resume_stats();
+
+DROP TRIGGER IF EXISTS trg_resumes_stats_update ON resumes;
+CREATE TRIGGER trg_resumes_stats_update
+    AFTER UPDATE ON resumes
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_resume_stats();
+
+DROP TRIGGER IF EXISTS trg_resumes_stats_delete ON resumes;
+CREATE TRIGGER trg_resumes_stats_delete
+    AFTER DELETE ON resumes
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_resume_stats();